@@ -1,3 +1,5 @@
+from utils import CheckInput
+
 from .check_utf8_bom import check_utf8_bom
 from .check_xml_declaration import check_xml_declaration
 from .check_namespace_prefixes import check_namespace_prefixes
@@ -35,4 +37,25 @@ for check in check_functions:
         ALL_SINGLE_FILE_CHECKS.append(check)
 
 ALL_SINGLE_FILE_CHECKS.sort(key=lambda f: f._check_number)
-ALL_FILE_PAIR_CHECKS.sort(key=lambda f: f._check_number)
\ No newline at end of file
+ALL_FILE_PAIR_CHECKS.sort(key=lambda f: f._check_number)
+
+# Argument builders for each input kind. Single file checks are given the file path and its XliffDocument (None
+# before the file is loaded), file pair checks are given the master and translated XliffDocuments.
+SINGLE_FILE_CHECK_ARGUMENTS = {
+    CheckInput.FILE: lambda filepath, document: (filepath,),
+    CheckInput.LINES: lambda filepath, document: (document.filename, document.lines),
+    CheckInput.DOCUMENT: lambda filepath, document: (document,),
+}
+FILE_PAIR_CHECK_ARGUMENTS = {
+    CheckInput.LINES: lambda master, translated: (master.filename, master.lines, translated.filename, translated.lines),
+    CheckInput.DOCUMENT: lambda master, translated: (master, translated),
+}
+
+# Static dispatch tables of (check, argument builder) in pipeline order, so the validator does no reflection per file.
+# Checks that take the raw file run first, before the file is loaded; the rest run against the loaded XliffDocument.
+RAW_FILE_CHECK_DISPATCH = [(check, SINGLE_FILE_CHECK_ARGUMENTS[check._check_input])
+                           for check in ALL_SINGLE_FILE_CHECKS if check._check_input == CheckInput.FILE]
+DOCUMENT_CHECK_DISPATCH = [(check, SINGLE_FILE_CHECK_ARGUMENTS[check._check_input])
+                           for check in ALL_SINGLE_FILE_CHECKS if check._check_input != CheckInput.FILE]
+FILE_PAIR_CHECK_DISPATCH = [(check, FILE_PAIR_CHECK_ARGUMENTS[check._check_input])
+                            for check in ALL_FILE_PAIR_CHECKS]
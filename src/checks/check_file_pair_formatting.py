@@ -1,13 +1,186 @@
+from array import array
+from bisect import bisect_right
+
+from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
+from xliff_line_signatures import find_format_mismatches, token_text, WHITESPACE_MISMATCH
+from xliff_unit_index import NO_LINE
+
+# Beyond this many inserted/deleted lines the files are too different to align usefully (and the diff gets expensive)
+MAX_EDIT_DISTANCE = 1000
 
-@xliff_check(13, pair=True)
-def check_file_pair_formatting(english_filename, english_lines, translated_filename, translated_lines):
+@xliff_check(13, pair=True, version=2, input_kind=CheckInput.DOCUMENT)
+def check_file_pair_formatting(english_document, translated_document):
     """
     CHECK #13: Formatting
     Validate the translated file has identical formatting to the English master, including leading/trailing whitespace and the first tag on the line matches.
-    This is the same as CHECK #9 above and calls the same utility method to perform the check, but instead of passing in source and target 
+    This is the same as CHECK #9 above and calls the same utility method to perform the check, but instead of passing in source and target
     blocks as arrays of lines, this passes in the entire files as arrays of lines.
+
+    The comparison runs on the documents' LineSignatures. Files whose signatures are identical are accepted with a single
+    array comparison. Otherwise the lines that differ are aligned with a Myers diff (after trimming the common start and
+    end), so a missing or extra line is reported once, where it happens, and the lines after it are still compared
+    against their counterparts instead of all being reported as shifted. Lines that are paired up but differ are
+    reported like CHECK #9 does. Files of the same length that are too different to align are compared line by line.
     """
-    print("check_file_pair_formatting v1 called for", english_filename, " and ", translated_filename)
+    english_filename = english_document.filename
+    translated_filename = translated_document.filename
+    check_logger.debug("CHECK #13: check_file_pair_formatting v2 called for %s and %s", english_filename, translated_filename)
+
+    english = english_document.line_signatures
+    translated = translated_document.line_signatures
+    key_ids = {}
+    english_keys = _line_keys(english, key_ids)
+    translated_keys = _line_keys(translated, key_ids)
+    if english_keys == translated_keys:
+        return []
+    if len(english) == len(translated) and not find_format_mismatches(english, 0, translated, 0, len(english)):
+        return []  # Only differences the comparison allows (e.g. a line with no tag against one with a tag)
+
+    translated_lines = translated_document.lines
+    english_lines = english_document.lines
+    unit_index = translated_document.unit_index
     validation_issues = []
+
+    def add_issue(line_index, message):
+        line_index = min(line_index, len(translated_lines) - 1)
+        unit = bisect_right(unit_index.unit_start, line_index) - 1
+        inside_unit = unit >= 0 and (unit_index.unit_end[unit] == NO_LINE or unit_index.unit_end[unit] >= line_index)
+        validation_issues.append(ValidationIssue(
+            validator="File Pair Formatting",
+            message=message,
+            filename=translated_filename,
+            line=line_index + 1,
+            column_start=1,
+            column_end=1,
+            unit_id=unit_index.unit_ids[unit] if inside_unit else None,
+            text=translated_lines[line_index].strip() if line_index >= 0 else ""
+        ))
+
+    # Trim the common start and end; only the middle needs to be diffed
+    start = 0
+    end_english, end_translated = len(english_keys), len(translated_keys)
+    while start < end_english and start < end_translated and english_keys[start] == translated_keys[start]:
+        start += 1
+    while end_english > start and end_translated > start and english_keys[end_english - 1] == translated_keys[end_translated - 1]:
+        end_english -= 1
+        end_translated -= 1
+
+    edits = _myers_diff(english_keys[start:end_english], translated_keys[start:end_translated], MAX_EDIT_DISTANCE)
+    if edits is None and len(english) == len(translated):
+        # Too different to align, but with no lines added or removed overall, so compare line by line
+        edits = [edit for i in range(end_english - start) for edit in (("delete", i), ("insert", i))]
+    if edits is None:
+        add_issue(start, f"Formatting differs from master line {start + 1} on, and the files are too different to align "
+                         f"(more than {MAX_EDIT_DISTANCE} lines added or removed).")
+        return validation_issues
+
+    for english_run, translated_run, translated_position in _changed_runs(edits, start):
+        paired = min(len(english_run), len(translated_run))
+        for e, t in zip(english_run[:paired], translated_run[:paired]):
+            for _, kind in find_format_mismatches(english, e, translated, t, 1):
+                if kind == WHITESPACE_MISMATCH:
+                    add_issue(t, f"Line {t + 1} has different whitespace formatting than master line {e + 1}.")
+                else:
+                    add_issue(t, f"Line {t + 1} starts with different tag than master line {e + 1}: "
+                                 f"master='{token_text(english.tag[e])}', translated='{token_text(translated.tag[t])}'")
+        missing = english_run[paired:]
+        if missing:
+            first, last = missing[0] + 1, missing[-1] + 1
+            lines = f"line {first}" if first == last else f"lines {first}-{last}"
+            position = translated_run[paired - 1] + 1 if paired else translated_position
+            add_issue(position, f"Master {lines} missing from the translated file here: '{english_lines[missing[0]].strip()}'")
+        extra = translated_run[paired:]
+        if extra:
+            first, last = extra[0] + 1, extra[-1] + 1
+            lines = f"Line {first} is" if first == last else f"Lines {first}-{last} are"
+            add_issue(extra[0], f"{lines} not in the master.")
+
     return validation_issues
+
+
+def _line_keys(signatures, ids):
+    # One integer per line for its whole signature (leading whitespace, trailing whitespace, first tag); ids is shared
+    # by the files being compared so equal signatures get equal keys
+    return array("l", (ids.setdefault(key, len(ids)) for key in zip(signatures.leading, signatures.trailing, signatures.tag)))
+
+
+def _myers_diff(a, b, max_distance):
+    """
+    Returns the shortest edit script turning sequence a into b as a list of ("delete", i) and ("insert", j) in order,
+    or None if it needs more than max_distance edits. Myers' O((N+M)D) algorithm.
+    """
+    n, m = len(a), len(b)
+    offset = max_distance + 1
+    v = array("l", [0]) * (2 * offset + 1)
+    trace = []
+    for d in range(min(max_distance, n + m) + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace, n, m):
+    edits = []
+    x, y = n, m
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]  # v as it was before step d, stored for k in -d-1 .. d+1
+
+        def at(k, v=v, d=d):
+            return v[k + d + 1]
+
+        k = x - y
+        previous_k = k + 1 if k == -d or (k != d and at(k - 1) < at(k + 1)) else k - 1
+        previous_x = at(previous_k)
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+        if x == previous_x:
+            edits.append(("insert", previous_y))
+        else:
+            edits.append(("delete", previous_x))
+        x, y = previous_x, previous_y
+    edits.reverse()
+    return edits
+
+
+def _changed_runs(edits, start):
+    """
+    Groups an edit script into runs of adjacent changes (no matching line between them). Yields (english lines,
+    translated lines, translated position) per run, as 0-based line numbers in the full files offset by start; the
+    translated position is where the run starts in the translated file.
+    """
+    english_run, translated_run = [], []
+    x = y = run_position = 0
+    for op, i in edits:
+        skipped = i - x if op == "delete" else i - y  # Matching lines before this edit
+        if skipped:
+            if english_run or translated_run:
+                yield english_run, translated_run, start + run_position
+                english_run, translated_run = [], []
+            x += skipped
+            y += skipped
+        if not english_run and not translated_run:
+            run_position = y
+        if op == "delete":
+            english_run.append(start + i)
+            x = i + 1
+        else:
+            translated_run.append(start + i)
+            y = i + 1
+    if english_run or translated_run:
+        yield english_run, translated_run, start + run_position
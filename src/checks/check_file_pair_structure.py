@@ -1,7 +1,20 @@
+from lxml import etree
+
+from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
+
+# Attributes that may differ between the master and the translated file, by element name
+IGNORED_ATTRIBUTES = {
+    "xliff": {"trgLang"},
+    "segment": {"state"},
+}
+# Elements whose text (and their descendants' text) is not compared
+TEXT_IGNORED_ELEMENTS = {"target", "value"}
 
-@xliff_check(15, pair=True)
-def check_file_pair_structure(english_filename, english_lines, translated_filename, translated_lines):
+@xliff_check(15, pair=True, version=4, requires=("check_xml_validation",), input_kind=CheckInput.DOCUMENT)
+def check_file_pair_structure(english_document, translated_document):
     """
     CHECK #15: XML Structure
     Ensure that both files contain the exact same XML structure, matching tags, ordering, nesting, etc.
@@ -12,7 +25,189 @@ def check_file_pair_structure(english_filename, english_lines, translated_filena
     1. the trgLang attribute on the xliff element
     2. the value of the state attribute on a segment element
     3. the text nodes inside of a value element
+
+    Both trees are walked once, in step, with a stack of aligned child pairs (O(n) time, O(depth + siblings) extra
+    memory). The children of each parent are aligned by key: an element with an id (<file>, <unit>, <segment>, <data>,
+    <pc>, <ph>, ...) by its tag, id and occurrence (as units are in CHECK #14), any other node by its tag and occurrence. When two siblings don't match, the walk resynchronises on the next key the two
+    parents share, so a missing or extra element is reported once and the siblings after it are still compared with
+    their counterparts. Whitespace-only text (indentation) is left to CHECK #13.
+    """
+    english_filename = english_document.filename
+    translated_filename = translated_document.filename
+    check_logger.debug("CHECK #15: check_file_pair_structure v4 called for %s and %s", english_filename, translated_filename)
+    try:
+        english_root, translated_root = english_document.tree, translated_document.tree
+    except etree.XMLSyntaxError:
+        return []  # CHECK #5 reports files that aren't well-formed
+    return structure_issues(translated_filename, translated_document.lines, english_root, translated_root)
+
+
+def _name(element):
+    tag = element.tag
+    if isinstance(tag, str):
+        return tag.rpartition("}")[2]
+    return "!--" if tag is etree.Comment else "?"
+
+
+def _text_differs(master_text, translated_text):
+    master_text, translated_text = master_text or "", translated_text or ""
+    if master_text == translated_text:
+        return False
+    return bool(master_text.strip() or translated_text.strip())
+
+
+def structure_issues(filename, lines, master_root, translated_root):
+    """
+    Walks master_root and translated_root in parallel and returns a ValidationIssue for every difference (see
+    check_file_pair_structure()). lines are the translated file's lines, used for the issue text.
     """
-    print("check_file_pair_structure v1 called for", english_filename, " and ", translated_filename)
     validation_issues = []
+
+    def add_issue(element, unit_id, message, needle=None):
+        line = element.sourceline
+        line_text = lines[line - 1].strip() if line and 0 < line <= len(lines) else "(unknown)"
+        col_start = line_text.find(needle) + 1 if needle and needle in line_text else 1
+        col_end = col_start + len(needle) - 1 if needle and col_start > 1 else 1
+        validation_issues.append(ValidationIssue(
+            validator="XML Structure",
+            message=message,
+            filename=filename,
+            line=line,
+            column_start=col_start,
+            column_end=col_end,
+            unit_id=unit_id,
+            text=line_text
+        ))
+
+    def compare(master, translated, text_ignored, unit_id):
+        # Compares the nodes themselves (not their children); returns False if they are different kinds of node
+        name = _name(translated)
+        if master.tag != translated.tag:
+            add_issue(translated, unit_id, f"Element mismatch: master has <{_name(master)}> (line {master.sourceline}), translated has <{name}>.", f"<{name}")
+            return False
+        if name == "unit" and master.get("id") != translated.get("id"):
+            add_issue(translated, translated.get("id"), f"Unit mismatch: master has unit '{master.get('id')}' (line {master.sourceline}), translated has '{translated.get('id')}'.", 'id="')
+            return False
+
+        ignored = IGNORED_ATTRIBUTES.get(name, ())
+        master_attributes, translated_attributes = master.attrib, translated.attrib
+        if master_attributes != translated_attributes:
+            for key in sorted(set(master_attributes) | set(translated_attributes)):
+                attribute = key.rpartition("}")[2]
+                if attribute in ignored:
+                    continue
+                master_value, translated_value = master_attributes.get(key), translated_attributes.get(key)
+                if master_value == translated_value:
+                    continue
+                if translated_value is None:
+                    message = f"Attribute '{attribute}' on <{name}> is missing (master has '{master_value}')."
+                elif master_value is None:
+                    message = f"Attribute '{attribute}' on <{name}> is not in the master."
+                else:
+                    message = f"Attribute '{attribute}' on <{name}> is '{translated_value}', master has '{master_value}'."
+                add_issue(translated, unit_id, message, f'{attribute}="')
+
+        if not text_ignored and _text_differs(master.text, translated.text):
+            add_issue(translated, unit_id, f"Text in <{name}> differs from the master: '{(master.text or '').strip()}'.")
+        return True
+
+    if not compare(master_root, translated_root, False, None):
+        return validation_issues
+
+    # Each frame: (aligned (master, translated) children, translated parent, text ignored, unit id)
+    stack = [(_aligned_children(master_root, translated_root), translated_root, False, None)]
+    while stack:
+        pairs, translated_parent, text_ignored, unit_id = stack[-1]
+        pair = next(pairs, None)
+        if pair is None:
+            stack.pop()
+            continue
+        master, translated = pair
+        if translated is None:
+            if _name(master) == "unit":
+                message = f"Unit '{master.get('id')}' (master line {master.sourceline}) is missing from <{_name(translated_parent)}>."
+            else:
+                message = f"Element <{_name(master)}> (master line {master.sourceline}) is missing from <{_name(translated_parent)}>."
+            add_issue(translated_parent, unit_id, message)
+            continue
+        if master is None:
+            if _name(translated) == "unit":
+                add_issue(translated, translated.get("id"), f"Unit '{translated.get('id')}' is not in the master.", 'id="')
+            else:
+                add_issue(translated, unit_id, f"Element <{_name(translated)}> is not in the master.", f"<{_name(translated)}")
+            continue
+
+        name = _name(translated)
+        child_text_ignored = text_ignored or _name(master) in TEXT_IGNORED_ELEMENTS
+        child_unit_id = translated.get("id") if name == "unit" else unit_id
+        if not compare(master, translated, child_text_ignored, child_unit_id):
+            continue  # Different kinds of node; their children aren't comparable
+        if not text_ignored and _text_differs(master.tail, translated.tail):
+            add_issue(translated, unit_id, f"Text after </{name}> differs from the master: '{(master.tail or '').strip()}'.")
+        if len(master) or len(translated):
+            stack.append((_aligned_children(master, translated), translated, child_text_ignored, child_unit_id))
+
     return validation_issues
+
+
+def _child_keys(parent):
+    # (tag, id, occurrence) of each child: elements with an id are told apart by it, other nodes only by tag
+    occurrences = {}
+    keys = []
+    for child in parent:
+        tag = child.tag
+        base = (tag, child.get("id") if isinstance(tag, str) else None)
+        occurrence = occurrences.get(base, 0)
+        occurrences[base] = occurrence + 1
+        keys.append((*base, occurrence))
+    return keys
+
+
+def _aligned_children(master, translated):
+    """
+    Yields (master child, translated child) pairs for the children of master and translated, in order, with None for
+    the side a child is missing from. Children with the same key are paired; at a mismatch, whichever child the other
+    parent has later is kept for resynchronising and the other one is skipped. Two children with keys the other parent
+    doesn't have at all are paired, so compare() reports them as a mismatch.
+    """
+    master_children, translated_children = list(master), list(translated)
+    master_keys, translated_keys = _child_keys(master), _child_keys(translated)
+    master_positions = {key: position for position, key in enumerate(master_keys)}
+    translated_positions = {key: position for position, key in enumerate(translated_keys)}
+    i = j = 0
+    while i < len(master_children) and j < len(translated_children):
+        if master_keys[i] == translated_keys[j]:
+            yield master_children[i], translated_children[j]
+            i += 1
+            j += 1
+            continue
+        later_in_translated = translated_positions.get(master_keys[i], -1) > j
+        later_in_master = master_positions.get(translated_keys[j], -1) > i
+        if later_in_translated and later_in_master:
+            # Both come later on the other side (reordered); skip the child that is nearer to its counterpart
+            if translated_positions[master_keys[i]] - j <= master_positions[translated_keys[j]] - i:
+                later_in_master = False
+            else:
+                later_in_translated = False
+        if later_in_translated:
+            yield None, translated_children[j]
+            j += 1
+        elif later_in_master:
+            yield master_children[i], None
+            i += 1
+        elif master_keys[i] in translated_positions or translated_keys[j] in master_positions:
+            # One of them was already passed on the other side; report the one without a counterpart ahead
+            if translated_keys[j] in master_positions:
+                yield None, translated_children[j]
+                j += 1
+            else:
+                yield master_children[i], None
+                i += 1
+        else:
+            yield master_children[i], translated_children[j]
+            i += 1
+            j += 1
+    for child in master_children[i:]:
+        yield child, None
+    for child in translated_children[j:]:
+        yield None, child
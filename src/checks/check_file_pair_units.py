@@ -1,11 +1,120 @@
+from bisect import bisect_left
+
+from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
 
-@xliff_check(14, pair=True)
-def check_file_pair_units(english_filename, english_lines, translated_filename, translated_lines):
+@xliff_check(14, pair=True, version=2, input_kind=CheckInput.DOCUMENT)
+def check_file_pair_units(english_document, translated_document):
     """
     CHECK #14 Units
     Check that the translated file has the same units as the English master. Each unit that is out of order, missing, or extra is a validation issue.
+
+    Units are identified by their id, found with each document's UnitIndex (no XML parsing); an id used in more than one
+    <file> element is told apart by its occurrence (the second unit 'x' matches the master's second unit 'x'). Each
+    translated unit is looked up in a hash index of the master's units, and the longest increasing subsequence of the
+    matched master positions is taken as the units that are in order; every other matched unit is out of order. This
+    is O(n log n), and a single moved unit is reported once rather than shifting everything after it. Issues give the
+    line numbers in both files.
     """
-    print("check_file_pair_units v1 called for", english_filename, " and ", translated_filename)
+    english_filename = english_document.filename
+    translated_filename = translated_document.filename
+    check_logger.debug("CHECK #14: check_file_pair_units v2 called for %s and %s", english_filename, translated_filename)
+
+    english_index = english_document.unit_index
+    translated_index = translated_document.unit_index
+    translated_lines = translated_document.lines
+
+    def unit_keys(index):
+        occurrences = {}
+        keys = []
+        for unit_id in index.unit_ids:
+            occurrence = occurrences.get(unit_id, 0)
+            occurrences[unit_id] = occurrence + 1
+            keys.append((unit_id, occurrence))
+        return keys
+
+    english_keys = unit_keys(english_index)
+    translated_keys = unit_keys(translated_index)
+
+    english_positions = {}
+    for position, key in enumerate(english_keys):
+        english_positions.setdefault(key, position)
+
+    def add_issue(line_index, unit_id, message):
+        line_text = translated_lines[line_index].strip() if 0 <= line_index < len(translated_lines) else ""
+        validation_issues.append((line_index, ValidationIssue(
+            validator="File Pair Units",
+            message=message,
+            filename=translated_filename,
+            line=line_index + 1,
+            column_start=1,
+            column_end=1,
+            unit_id=unit_id,
+            text=line_text
+        )))
+
     validation_issues = []
-    return validation_issues
+    matched = []  # (translated position, english position) of each translated unit found in the master
+    translated_positions = {}
+    for position, key in enumerate(translated_keys):
+        translated_positions[key] = position
+        line_index = translated_index.unit_start[position]
+        unit_id, occurrence = key
+        english_position = english_positions.get(key)
+        if english_position is not None:
+            matched.append((position, english_position))
+        elif occurrence:
+            first_line = translated_index.unit_start[translated_positions[(unit_id, 0)]] + 1
+            add_issue(line_index, unit_id, f"Duplicate unit '{unit_id}' (first at translated line {first_line}) is not in the master.")
+        else:
+            add_issue(line_index, unit_id, f"Unit '{unit_id}' is not in the master.")
+
+    in_order = longest_increasing_subsequence([english_position for _, english_position in matched])
+    for i, (position, english_position) in enumerate(matched):
+        if i not in in_order:
+            add_issue(translated_index.unit_start[position], translated_keys[position][0],
+                      f"Unit '{translated_keys[position][0]}' is out of order: master line {english_index.unit_start[english_position] + 1}, "
+                      f"translated line {translated_index.unit_start[position] + 1}.")
+
+    # Missing units are reported where they belong in the translated file: before the next master unit that is there
+    translated_line_of_english = {english_position: translated_index.unit_start[position] for position, english_position in matched}
+    next_line = len(translated_lines) - 1
+    missing = []
+    for english_position in range(len(english_keys) - 1, -1, -1):
+        if english_position in translated_line_of_english:
+            next_line = translated_line_of_english[english_position]
+        else:
+            missing.append((next_line, english_keys[english_position][0], english_index.unit_start[english_position] + 1))
+    for line_index, unit_id, english_line in reversed(missing):
+        add_issue(line_index, unit_id, f"Unit '{unit_id}' (master line {english_line}) is missing from the translated file.")
+
+    validation_issues.sort(key=lambda item: item[0])
+    return [issue for _, issue in validation_issues]
+
+
+def longest_increasing_subsequence(values):
+    """
+    Returns the set of indices of one longest strictly increasing subsequence of values, in O(n log n).
+    """
+    tails = []        # tails[k] is the index of the smallest value ending an increasing subsequence of length k + 1
+    tail_values = []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        k = bisect_left(tail_values, value)
+        if k:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    result = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        result.add(i)
+        i = previous[i]
+    return result
@@ -1,11 +1,58 @@
+from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
+from xliff_unit_index import UnitIndex, NO_LINE, element_content
 
-@xliff_check(11)
-def check_initial_segment_targets(filename, lines):
+@xliff_check(11, version=2, input_kind=CheckInput.DOCUMENT)
+def check_initial_segment_targets(document):
     """
     CHECK #11: Initial State
     Checks if the the segment state is "initial" then the target element should either not exist or contain an exact copy of the source.
+
+    The segments, their states and the lines of their <source> and <target> come from the document's UnitIndex, so only
+    the segments in state "initial" are looked at and nothing is parsed: the content of the two spans is cut from the lines
+    between the element tags and compared as is.
+    """
+    filename = document.filename
+    check_logger.debug("CHECK #11: check_initial_segment_targets v2 called for %s", filename)
+    return initial_segment_issues_for_lines(filename, document.lines, index=document.unit_index)
+
+
+def initial_segment_issues_for_lines(filename, lines, first_line_number=1, index=None):
+    """
+    Runs CHECK #11 over lines, a slice of the file starting at line number first_line_number (e.g. the lines of one unit).
+    index is the UnitIndex of lines, built here if not given. Shared by check_initial_segment_targets() and the streaming
+    validator.
     """
-    print("CHECK #11: check_initial_segment_targets v1 called for", filename)
+    if index is None:
+        index = UnitIndex.build(lines)
+
     validation_issues = []
+    if "initial" not in index.states:
+        return validation_issues
+    initial = index.states.index("initial")
+
+    for segment, state in enumerate(index.segment_state):
+        target_start = index.target_start[segment]
+        if state != initial or target_start == NO_LINE:
+            continue
+        target = element_content(lines, target_start, index.target_end[segment], "target")
+        source = element_content(lines, index.source_start[segment], index.source_end[segment], "source")
+        if target is None or target == source:
+            continue  # An unclosed target is reported by CHECK #5
+
+        line_text = lines[target_start].strip()
+        validation_issues.append(ValidationIssue(
+            validator="Initial State",
+            message="Segment state is 'initial' but the target is not a copy of the source.",
+            filename=filename,
+            line=first_line_number + target_start,
+            column_start=1,
+            column_end=1,
+            unit_id=index.unit_id_of_segment(segment),
+            text=line_text
+        ))
+
     return validation_issues
+
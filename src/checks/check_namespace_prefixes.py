@@ -1,14 +1,15 @@
 import re
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
 
-@xliff_check(3)
+@xliff_check(3, version=4)
 def check_namespace_prefixes(filename, lines):
     """
     CHECK #3: XML Namespace Prefixes
     Check that the file does not contain element namespace prefixes like "ns0:" or any other form like <ns:tag> or </ns:tag>.
     """
-    print("CHECK #3: check_namespace_prefixes v4 called for", filename)
+    check_logger.debug("CHECK #3: check_namespace_prefixes v4 called for %s", filename)
     validation_issues = []
 
     namespace_tag_pattern = re.compile(r"<\/?([a-zA-Z0-9]+):[a-zA-Z0-9]+")
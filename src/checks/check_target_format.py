@@ -1,9 +1,12 @@
-import re
-from utils import compare_format_lines
+from utils import compare_format_signatures
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
+from xliff_unit_index import UnitIndex, NO_LINE
+from xliff_line_signatures import LineSignatures
 
-@xliff_check(9)
-def check_target_format(filename, lines):
+@xliff_check(9, version=7, input_kind=CheckInput.DOCUMENT)
+def check_target_format(document):
     """
     CHECK #9: Target Format
     Check each target block against its source to ensure the formatting and first tag on each line is the same as the source.
@@ -13,40 +16,37 @@ def check_target_format(filename, lines):
     and start with the same tag as the source line does.
     There are two exceptions: on any line if you detect the starting tags are "<source" and "<target", or "</source" and "</target", 
     which will happen when comparing a source block to a target block, consider those equivalent and don't create a validation issue.
-    """
-    print("CHECK #9: check_target_format v6 called for", filename)
-
-    validation_issues = []
-    unit_id = None
-    in_source = False
-    in_target = False
-    source_lines = []
-    target_lines = []
 
-    for i, line in enumerate(lines):
-        stripped = line.strip()
+    The source/target pairs come from the document's UnitIndex, so the file is scanned once for all line-based checks, and
+    each pair is compared on the document's precomputed LineSignatures.
+    """
+    filename = document.filename
+    check_logger.debug("CHECK #9: check_target_format v7 called for %s", filename)
+    return target_format_issues_for_lines(filename, document.lines, index=document.unit_index, signatures=document.line_signatures)
 
-        if '<unit' in stripped:
-            match = re.search(r'id=["\'](.*?)["\']', stripped)
-            unit_id = match.group(1) if match else None
 
-        if '<source' in stripped:
-            in_source = True
-            source_lines = []
-        if in_source:
-            source_lines.append(line)
-        if '</source' in stripped:
-            in_source = False
+def target_format_issues_for_lines(filename, lines, first_line_number=1, index=None, signatures=None):
+    """
+    Runs CHECK #9 over lines, a slice of the file starting at line number first_line_number (e.g. the lines of one unit).
+    index and signatures are the UnitIndex and LineSignatures of lines, built here if not given. Shared by
+    check_target_format() and the streaming validator.
+    """
+    if index is None:
+        index = UnitIndex.build(lines)
+    if signatures is None:
+        signatures = LineSignatures.build(lines)
 
-        if '<target' in stripped:
-            in_target = True
-            target_lines = []
-        if in_target:
-            target_lines.append(line)
-        if '</target' in stripped:
-            in_target = False
-            validation_issues.extend(
-                compare_format_lines(source_lines, target_lines, filename, unit_id, i + 1, "Target Format")
-            )
+    validation_issues = []
+    for segment in range(index.segment_count):
+        target_end = index.target_end[segment]
+        if target_end == NO_LINE:
+            continue
+        source_start, source_end = index.source_start[segment], index.source_end[segment]
+        source_count = source_end - source_start + 1 if source_start != NO_LINE and source_end != NO_LINE else 0
+        target_start = index.target_start[segment]
+        validation_issues.extend(compare_format_signatures(
+            lines, signatures, source_start, source_count, target_start, target_end - target_start + 1, filename,
+            index.unit_id_of_segment(segment), first_line_number + target_end, "Target Format"
+        ))
 
     return validation_issues
@@ -1,9 +1,13 @@
-import re
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
 
-@xliff_check(10)
-def check_untranslated_targets(filename, lines):
+# Units whose target should be an exact copy of the source (the customer's name isn't translated)
+UNTRANSLATED_UNIT_IDS = frozenset({"header.application_name"})
+
+@xliff_check(10, version=6, requires=("check_xml_validation",), input_kind=CheckInput.DOCUMENT)
+def check_untranslated_targets(document):
     """
     CHECK #10: Untranslated Targets
     If the trgLang of the file differs from the srcLang, then this file represents a file with translations. Each segment that is 
@@ -21,121 +25,84 @@ def check_untranslated_targets(filename, lines):
     - The unit header.application_name should never be translated and the target should match the source exactly.
     The customer, Minnesota Certification Board, decided they didn't want their name translated.
     """
-    print("CHECK #10: check_untranslated_targets v5 called for", filename)
-    import xml.etree.ElementTree as ET
+    filename = document.filename
+    check_logger.debug("CHECK #10: check_untranslated_targets v6 called for %s", filename)
+
+    validation_issues = []
+    trg_lang = document.target_language
+    src_lang = document.source_language
+
+    if not (trg_lang and src_lang and trg_lang != src_lang):
+        return validation_issues
+
+    for segment in document.segments:
+        validation_issues.extend(untranslated_target_issues_for_segment(filename, segment))
+
+    return validation_issues
 
+
+def untranslated_target_issues_for_segment(filename, segment):
+    """
+    Runs CHECK #10 for a single <segment> element of a file whose trgLang differs from its srcLang.
+    Shared by check_untranslated_targets() and the streaming validator.
+    """
     validation_issues = []
-    trg_lang = None
-    src_lang = None
-    current_unit_id = None
-    in_segment = False
-    source_xml = ""
-    target_xml = ""
-    line_number = 0
-    in_source = False
-    in_target = False
-    target_found = False
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-
-        if '<xliff' in line and 'trgLang=' in line and 'srcLang=' in line:
-            trg_match = re.search(r'trgLang=["\'](.*?)["\']', line)
-            src_match = re.search(r'srcLang=["\'](.*?)["\']', line)
-            if trg_match and src_match:
-                trg_lang = trg_match.group(1)
-                src_lang = src_match.group(1)
-
-        if '<unit' in line:
-            match = re.search(r'id=["\'](.*?)["\']', line)
-            current_unit_id = match.group(1) if match else None
-
-        if '<segment' in line:
-            in_segment = True
-            source_xml = ""
-            target_xml = ""
-            line_number = i + 1
-            target_found = False
-
-        if '</segment>' in line:
-            in_segment = False
-            if trg_lang and src_lang and trg_lang != src_lang:
-                if not target_found:
-                    validation_issues.append(ValidationIssue(
-                        validator="Untranslated Targets",
-                        message="Target is missing",
-                        filename=filename,
-                        line=line_number,
-                        column_start=1,
-                        column_end=1,
-                        unit_id=current_unit_id,
-                        text=""
-                    ))
-                else:
-                    try:
-                        src_root = ET.fromstring(f"<wrapper>{source_xml}</wrapper>")
-                        tgt_root = ET.fromstring(f"<wrapper>{target_xml}</wrapper>")
-
-                        def extract_text(elem):
-                            return ''.join([e.strip() for e in elem.itertext() if e.strip()])
-
-                        src_text = extract_text(src_root)
-                        tgt_text = extract_text(tgt_root)
-
-                        if current_unit_id == "header.application_name":
-                            continue
-
-                        if not tgt_text:
-                            validation_issues.append(ValidationIssue(
-                                validator="Untranslated Targets",
-                                message="Target is empty",
-                                filename=filename,
-                                line=line_number,
-                                column_start=1,
-                                column_end=1,
-                                unit_id=current_unit_id,
-                                text=""
-                            ))
-                        elif tgt_text == src_text:
-                            validation_issues.append(ValidationIssue(
-                                validator="Untranslated Targets",
-                                message="Target is identical to source",
-                                filename=filename,
-                                line=line_number,
-                                column_start=1,
-                                column_end=1,
-                                unit_id=current_unit_id,
-                                text=tgt_text
-                            ))
-                        elif src_text in tgt_text:
-                            validation_issues.append(ValidationIssue(
-                                validator="Untranslated Targets",
-                                message="Target contains unmodified source text",
-                                filename=filename,
-                                line=line_number,
-                                column_start=1,
-                                column_end=1,
-                                unit_id=current_unit_id,
-                                text=tgt_text
-                            ))
-
-                    except ET.ParseError:
-                        continue
-
-        if in_segment:
-            if '<source' in stripped:
-                in_source = True
-            if in_source:
-                source_xml += line
-            if '</source>' in stripped:
-                in_source = False
-
-            if '<target' in stripped:
-                in_target = True
-                target_found = True
-            if in_target:
-                target_xml += line
-            if '</target>' in stripped:
-                in_target = False
+    ns = {"ns": "urn:oasis:names:tc:xliff:document:2.0"}
+
+    def extract_text(elem):
+        return ''.join([e.strip() for e in elem.itertext() if e.strip()])
+
+    unit = segment.getparent()
+    current_unit_id = unit.get("id") if unit is not None else None
+    line_number = segment.sourceline
+    source = segment.find("ns:source", namespaces=ns)
+    target = segment.find("ns:target", namespaces=ns)
+
+    if target is None:
+        validation_issues.append(ValidationIssue(
+            validator="Untranslated Targets",
+            message="Target is missing",
+            filename=filename,
+            line=line_number,
+            column_start=1,
+            column_end=1,
+            unit_id=current_unit_id,
+            text=""
+        ))
+        return validation_issues
+
+    if current_unit_id in UNTRANSLATED_UNIT_IDS:
+        return validation_issues
+
+    src_text = extract_text(source) if source is not None else ""
+    tgt_text = extract_text(target)
+
+    reason = untranslated_reason(src_text, tgt_text)
+    if reason:
+        validation_issues.append(ValidationIssue(
+            validator="Untranslated Targets",
+            message=reason,
+            filename=filename,
+            line=line_number,
+            column_start=1,
+            column_end=1,
+            unit_id=current_unit_id,
+            text=tgt_text
+        ))
 
     return validation_issues
+
+
+def untranslated_reason(src_text, tgt_text):
+    """
+    Returns why a target is not a translation of its source (the message of the CHECK #10 issue), or None if it is one.
+    src_text and tgt_text are the elements' non-blank text nodes, stripped and joined. Shared with the translation
+    memory, which doesn't import untranslated targets.
+    """
+    if not tgt_text:
+        return "Target is empty"
+    if tgt_text == src_text:
+        return "Target is identical to source"
+    if src_text in tgt_text:
+        return "Target contains unmodified source text"
+    return None
@@ -1,8 +1,10 @@
 import os
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
 
-@xliff_check(1)
+@xliff_check(1, version=3, input_kind=CheckInput.FILE)
 def check_utf8_bom(file_path):
     """
     CHECK #1: UTF-8 BOM (v3)
@@ -10,7 +12,7 @@ def check_utf8_bom(file_path):
     """
     import codecs
     filename=os.path.basename(file_path)
-    print("CHECK #1: check_utf8_bom v3 called for", filename)
+    check_logger.debug("CHECK #1: check_utf8_bom v3 called for %s", filename)
     validation_issues = []
     
     try:
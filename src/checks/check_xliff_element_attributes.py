@@ -1,8 +1,9 @@
 import re
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
 
-@xliff_check(4)
+@xliff_check(4, version=2)
 def check_xliff_element_attributes(filename, lines):
     """
     CHECK #4: XLIFF Element Attributes
@@ -15,7 +16,7 @@ def check_xliff_element_attributes(filename, lines):
     - trgLang matches the filename's language code
     """
 
-    print("CHECK #4: check_xliff_element_attributes v2 called for", filename)
+    check_logger.debug("CHECK #4: check_xliff_element_attributes v2 called for %s", filename)
     validation_issues = []
     expected_attrs = [
         ("xmlns", "urn:oasis:names:tc:xliff:document:2.0"),
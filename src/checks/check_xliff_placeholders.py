@@ -1,17 +1,46 @@
+import re
+from xml.sax.saxutils import escape
+
+from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
+
+XLIFF_NS = "urn:oasis:names:tc:xliff:document:2.0"
+HTML = "HTML"
+XML = "XML"
+
+# Element names of HTML 5; a <data> value starting with one of these tags is HTML, any other tag (e.g. Storyline's <Style>) is XML
+HTML_ELEMENTS = frozenset("""
+    a abbr address area article aside audio b base bdi bdo blockquote body br button canvas caption cite code col colgroup
+    data datalist dd del details dfn dialog div dl dt em embed fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 head
+    header hgroup hr html i iframe img input ins kbd label legend li link main map mark menu meta meter nav noscript object
+    ol optgroup option output p param picture pre progress q rp rt ruby s samp script search section select slot small
+    source span strong style sub summary sup table tbody td template textarea tfoot th thead time title tr track u ul var
+    video wbr
+""".split())
+TAG_NAME_PATTERN = re.compile(r"\s*</?([A-Za-z][\w:.-]*)")
 
-@xliff_check(12)
-def check_xliff_placeholders(filename, lines):
+# Inline elements that are replaced by <data> values, and the attributes holding the ids of those values
+REFERENCE_ATTRIBUTES = {
+    "ph": ("dataRef",),
+    "pc": ("dataRefStart", "dataRefEnd"),
+    "sc": ("dataRef",),
+    "ec": ("dataRef",),
+}
+
+@xliff_check(12, version=2, requires=("check_xml_validation",), input_kind=CheckInput.DOCUMENT)
+def check_xliff_placeholders(document):
     """
     CHECK #12: XLIFF Placeholders
-    If a unit has an originalData element, then it uses XLIFF placeholders. These are pc and ph tags and they are used to escape 
+    If a unit has an originalData element, then it uses XLIFF placeholders. These are pc and ph tags and they are used to escape
     makup (tags) so they do not get mangled during human or machine translation.
 
     pc tag: is meant to enclose something with a <pc>asdfasdF</pc> but can be empty or even self-closed.
     has a dataRefStart attribute which references a data element in the originalData element by id
     has an optional dataRefEnd attribute which references a data element in the originalData element by id
-    The values of those data elements are the replacement values, the start pc tag is replaced by the value pointed 
-    to by dataRefStart, and the matching closing </pc> tag (careful, pc blocks can be nested) is replaced by the 
+    The values of those data elements are the replacement values, the start pc tag is replaced by the value pointed
+    to by dataRefStart, and the matching closing </pc> tag (careful, pc blocks can be nested) is replaced by the
     value in the data node with an id that matches the dataRefEnd.
 
     ph tag: has a dataRef attribute which references a data element in the originalData element by id. The data element's value
@@ -20,22 +49,201 @@ def check_xliff_placeholders(filename, lines):
     This checks that the data element referenced by every dataRefStart, dataRefEnd, and dataRef exists.
     It also checks to make sure every data element is referenced, and there are no unreferenced data elements.
 
-    If value of the source or target is HTML, then the pc tags represnt closeable elements like p, span, em, b, strong, etc 
+    If value of the source or target is HTML, then the pc tags represnt closeable elements like p, span, em, b, strong, etc
     and the ph tags represent self-closing elements like br, hr, img, etc.
 
-    If the data elements don't look like HTML tags, then the value is an Articulate Storyline or other type, and the tags represent 
+    If the data elements don't look like HTML tags, then the value is an Articulate Storyline or other type, and the tags represent
     something proprietary. Like with Storyline, it uses <Style> tags.
 
     The actual value should be reconstructed using this process and validated.
 
-    If value is HTML (because the data elements had values that look like HTML tags) then the HTML fragment should be 
-    validated with an HTML 5 validator in its most strict mode (enabling all warnings).
+    If value is HTML (because the data elements had values that look like HTML tags) then the HTML fragment should be
+    validated with an HTML 5 validator in its most strict mode (enabling all warnings). lxml's HTMLParser is used for
+    this, and it is libxml2's HTML 4 parser: it reports the HTML 5-only elements (e.g. <section>, <mark>, <time>) as
+    invalid tags, so those errors don't mean the fragment is broken.
 
-    Otherwise the value should be considered XML and an XML validator should be run on the XML fragment (enclosing it with a <root></root> first) 
+    Otherwise the value should be considered XML and an XML validator should be run on the XML fragment (enclosing it with a <root></root> first)
     in its most strict mode (enabling all warnings).
 
     Each error or warning raised by the HTML or XML validator should generate a validation issue.
+
+    The classification of each distinct <data> value is cached for the file (Storyline repeats the same <Style ...> values
+    hundreds of times), and the reconstructed fragments are collected in a FragmentBatch and validated together: all the
+    file's XML fragments in one strict parse and all its HTML fragments in one parse with lxml's HTML parser. Only when a
+    batch has errors are its distinct fragments parsed one by one, to report each error against its <source> or <target>.
     """
-    print("CHECK #12: check_xliff_placeholders v1 called for", filename)
+    filename = document.filename
+    check_logger.debug("CHECK #12: check_xliff_placeholders v2 called for %s", filename)
+    lines = document.lines
+
+    def get_line_text(line):
+        return lines[line - 1].strip() if line and 0 < line <= len(lines) else "(unknown)"
+
+    batch = FragmentBatch()
     validation_issues = []
+    for unit in document.units:
+        validation_issues.extend(placeholder_issues_for_unit(filename, unit, get_line_text, batch))
+    validation_issues.extend(batch.validate(filename, get_line_text))
+    validation_issues.sort(key=lambda issue: issue.line or 0)
+    return validation_issues
+
+
+def placeholder_issues_for_unit(filename, unit, get_line_text, batch):
+    """
+    Runs the reference part of CHECK #12 for a single <unit> element and adds the unit's reconstructed <source> and <target>
+    values to batch; call batch.validate() for the fragment issues. Shared by check_xliff_placeholders() and the streaming
+    validator.
+    """
+    validation_issues = []
+    unit_id = unit.get("id")
+    original_data = unit.find(f"{{{XLIFF_NS}}}originalData")
+    data_elements = original_data.findall(f"{{{XLIFF_NS}}}data") if original_data is not None else []
+    data_values = {data.get("id"): data.text or "" for data in data_elements}
+
+    def add_issue(element, message, needle=None):
+        line_text = get_line_text(element.sourceline)
+        col_start = line_text.find(needle) + 1 if needle and needle in line_text else 1
+        col_end = col_start + len(needle) - 1 if needle and col_start > 1 else 1
+        validation_issues.append(ValidationIssue(
+            validator="XLIFF Placeholders",
+            message=message,
+            filename=filename,
+            line=element.sourceline,
+            column_start=col_start,
+            column_end=col_end,
+            unit_id=unit_id,
+            text=line_text
+        ))
+
+    kind = XML if any(batch.classify(value) == XML for value in data_values.values()) else HTML
+    referenced = set()
+    for content in unit.iter(f"{{{XLIFF_NS}}}source", f"{{{XLIFF_NS}}}target"):
+        for element in content.iter(*(f"{{{XLIFF_NS}}}{name}" for name in REFERENCE_ATTRIBUTES)):
+            name = element.tag.rpartition("}")[2]
+            for attribute in REFERENCE_ATTRIBUTES[name]:
+                data_id = element.get(attribute)
+                if data_id is None:
+                    continue
+                referenced.add(data_id)
+                if data_id not in data_values:
+                    add_issue(element, f"<{name}> {attribute}='{data_id}' references a data element that is not in <originalData>.", f'{attribute}="{data_id}"')
+
+        if data_values:
+            batch.add(kind, reconstruct(content, data_values), content, unit_id)
+
+    for data in data_elements:
+        if data.get("id") not in referenced:
+            add_issue(data, f"Data element '{data.get('id')}' is not referenced by any pc or ph element.", f'id="{data.get("id")}"')
+
     return validation_issues
+
+
+def reconstruct(element, data_values):
+    """
+    Returns the original markup of a <source> or <target> element: its text, with every pc/ph (and sc/ec) replaced by the
+    <data> values it references and any other inline element (such as <mrk>) replaced by its content.
+    """
+    parts = [escape(element.text or "")]
+    for child in element:
+        if not isinstance(child.tag, str):
+            parts.append(escape(child.tail or ""))
+            continue
+        name = child.tag.rpartition("}")[2]
+        if name == "pc":
+            parts.append(data_values.get(child.get("dataRefStart"), ""))
+            parts.append(reconstruct(child, data_values))
+            parts.append(data_values.get(child.get("dataRefEnd"), ""))
+        elif name in REFERENCE_ATTRIBUTES:
+            parts.append(data_values.get(child.get("dataRef"), ""))
+        else:
+            parts.append(reconstruct(child, data_values))
+        parts.append(escape(child.tail or ""))
+    return "".join(parts)
+
+
+class FragmentBatch:
+    """
+    Reconstructed <source>/<target> values waiting to be validated, grouped by kind (HTML or XML), along with the cached
+    classification of the <data> values seen so far and the errors of the fragments validated so far.
+
+    max_cached limits how many <data> values and fragments are remembered: when validate() finds more, both caches are
+    emptied. The streaming validator uses one batch for a whole file and sets it, so memory doesn't grow with the file.
+    """
+
+    def __init__(self, max_cached=None):
+        self.fragments = {HTML: [], XML: []}  # kind -> [(fragment, source or target element, unit id)]
+        self.max_cached = max_cached
+        self._kinds = {}  # <data> value -> HTML or XML
+        self._errors = {}  # (kind, fragment) -> [error message]
+
+    def classify(self, value):
+        """
+        Returns HTML if the <data> value is an HTML tag (or has no tag), XML otherwise. Cached per distinct value.
+        """
+        kind = self._kinds.get(value)
+        if kind is None:
+            match = TAG_NAME_PATTERN.match(value)
+            kind = XML if match and match.group(1) not in HTML_ELEMENTS else HTML
+            self._kinds[value] = kind
+        return kind
+
+    def add(self, kind, fragment, element, unit_id):
+        self.fragments[kind].append((fragment, element, unit_id))
+
+    def validate(self, filename, get_line_text):
+        """
+        Validates the fragments added so far and returns a ValidationIssue for every error, then empties the batch.
+        """
+        from lxml import etree
+
+        validation_issues = []
+        for kind, fragments in self.fragments.items():
+            unchecked = [fragment for fragment in dict.fromkeys(fragment for fragment, _, _ in fragments) if (kind, fragment) not in self._errors]
+            if unchecked and self._batch_is_valid(kind, unchecked, etree):
+                for fragment in unchecked:
+                    self._errors[(kind, fragment)] = []
+            for fragment, element, unit_id in fragments:
+                for message in self._fragment_errors(kind, fragment, etree):
+                    line_text = get_line_text(element.sourceline)
+                    validation_issues.append(ValidationIssue(
+                        validator="XLIFF Placeholders",
+                        message=f"Reconstructed {kind} in <{element.tag.rpartition('}')[2]}> is invalid: {message}",
+                        filename=filename,
+                        line=element.sourceline,
+                        column_start=1,
+                        column_end=1,
+                        unit_id=unit_id,
+                        text=line_text
+                    ))
+        self.fragments = {HTML: [], XML: []}
+        if self.max_cached is not None:
+            if len(self._errors) > self.max_cached:
+                self._errors.clear()
+            if len(self._kinds) > self.max_cached:
+                self._kinds.clear()
+        return validation_issues
+
+    @staticmethod
+    def _batch_is_valid(kind, fragments, etree):
+        # One parse for all the fragments; they only need to be parsed one by one if this finds an error
+        if kind == XML:
+            try:
+                etree.fromstring("<batch>" + "".join(f"<root>{fragment}</root>" for fragment in fragments) + "</batch>", etree.XMLParser(resolve_entities=False, no_network=True))
+            except etree.XMLSyntaxError:
+                return False
+            return True
+        parser = etree.HTMLParser(recover=True, no_network=True)
+        etree.fromstring("<html><body>" + "".join(f"<div>{fragment}</div>" for fragment in fragments) + "</body></html>", parser)
+        return not len(parser.error_log)
+
+    def _fragment_errors(self, kind, fragment, etree):
+        errors = self._errors.get((kind, fragment))
+        if errors is None:
+            if kind == XML:
+                parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+                etree.fromstring(f"<root>{fragment}</root>", parser)
+            else:
+                parser = etree.HTMLParser(recover=True, no_network=True)
+                etree.fromstring(f"<div>{fragment}</div>", parser)
+            errors = self._errors[(kind, fragment)] = [error.message for error in parser.error_log]
+        return errors
@@ -2,30 +2,105 @@ import os
 from utils import Config
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
 
-@xliff_check(6)
-def check_xliff_schema(filename, lines):
+# Process-wide cache of compiled schemas: absolute schema path -> (mtimes of its files, etree.XMLSchema)
+_SCHEMA_CACHE = {}
+# The files each cached schema is compiled from (see schema_files()): absolute schema path -> [path]
+_SCHEMA_FILES = {}
+
+XSD_NS = "http://www.w3.org/2001/XMLSchema"
+# Elements through which a schema document loads other schema documents
+SCHEMA_REFERENCES = ("import", "include", "redefine", "override")
+
+
+def default_schema_path():
+    return os.path.join(Config.TEST_FILES_PATH, "xliff_core_2.0.xsd")
+
+
+def schema_files(schema_path=None):
+    """
+    Returns the absolute paths of the local files the schema at schema_path is compiled from: the schema itself, then
+    every file it loads through xs:import, xs:include, xs:redefine or xs:override (recursively), e.g. xml.xsd next to
+    xliff_core_2.0.xsd. Remote schemaLocations and files that don't exist are left out.
+    """
+    from lxml import etree
+
+    files = []
+    pending = [os.path.abspath(schema_path or default_schema_path())]
+    while pending:
+        path = pending.pop(0)
+        if path in files or not os.path.isfile(path):
+            continue
+        files.append(path)
+        try:
+            root = etree.parse(path, etree.XMLParser(resolve_entities=False, no_network=True)).getroot()
+        except etree.XMLSyntaxError:
+            continue  # load_xliff_schema() reports a broken schema
+        for element in root.iter(*(f"{{{XSD_NS}}}{name}" for name in SCHEMA_REFERENCES)):
+            location = element.get("schemaLocation")
+            if location and "://" not in location:
+                pending.append(os.path.normpath(os.path.join(os.path.dirname(path), location)))
+    return files
+
+
+def load_xliff_schema(schema_path=None):
+    """
+    Returns the compiled etree.XMLSchema for schema_path (defaults to xliff_core_2.0.xsd in Config.TEST_FILES_PATH).
+
+    Compiling the schema (including resolving the imported xml.xsd) is far more expensive than validating a file against it,
+    so compiled schemas are cached for the life of the process, keyed by path and the modification times of the schema
+    files (see schema_files()). Editing any of the .xsd files on disk invalidates the cached copy on the next call. The
+    list of files is resolved once per schema and again only when one of them changed, so a cache hit costs a stat per
+    file.
+    """
+    from lxml import etree
+
+    schema_path = os.path.abspath(schema_path or default_schema_path())
+    cached = _SCHEMA_CACHE.get(schema_path)
+    if cached:
+        try:
+            if cached[0] == tuple(os.path.getmtime(path) for path in _SCHEMA_FILES[schema_path]):
+                return cached[1]
+        except OSError:
+            pass  # An imported file was removed; resolve the files again
+
+    # The schema changed (or was never loaded), and may now import other files
+    _SCHEMA_FILES[schema_path] = schema_files(schema_path) or [schema_path]
+    mtime = tuple(os.path.getmtime(path) for path in _SCHEMA_FILES[schema_path])
+
+    # Load and parse the schema with import resolution support
+    parser = etree.XMLParser(load_dtd=True, resolve_entities=True)
+    with open(schema_path, "rb") as f:
+        schema_doc = etree.parse(f, parser, base_url=schema_path)
+    schema = etree.XMLSchema(schema_doc)
+    _SCHEMA_CACHE[schema_path] = (mtime, schema)
+    return schema
+
+
+def clear_xliff_schema_cache():
+    _SCHEMA_CACHE.clear()
+    _SCHEMA_FILES.clear()
+
+@xliff_check(6, version=4, requires=("check_xml_validation",), input_kind=CheckInput.DOCUMENT)
+def check_xliff_schema(document):
     """
     CHECK #6: XLIFF Schema
     Check the XLIFF file against the xliff_core_2.0.xsd.
     """
-    print("CHECK #6: check_xliff_schema v3 called for", filename)
+    filename = document.filename
+    check_logger.debug("CHECK #6: check_xliff_schema v4 called for %s", filename)
     from lxml import etree
 
     validation_issues = []
-    xml_string = "".join(lines)
+    lines = document.lines
 
     try:
-        # Load and parse the schema with import resolution support
-        parser = etree.XMLParser(load_dtd=True, resolve_entities=True)
-        schema_path = os.path.join(Config.TEST_FILES_PATH, "xliff_core_2.0.xsd")
-        with open(schema_path, "rb") as f:
-            schema_doc = etree.parse(f, parser)
-        schema = etree.XMLSchema(schema_doc)
+        schema = load_xliff_schema()
 
-        # Parse the XLIFF file against the schema
-        xml_doc = etree.fromstring(xml_string.encode("utf-8"))
-        schema.assertValid(xml_doc)
+        # Validate the already parsed XLIFF file against the schema
+        schema.assertValid(document.tree)
 
     except etree.DocumentInvalid as e:
         error = schema.error_log.last_error
@@ -67,3 +142,7 @@ def check_xliff_schema(filename, lines):
         ))
 
     return validation_issues
+
+
+if Config.PRELOAD_SCHEMA:
+    load_xliff_schema()
@@ -1,14 +1,15 @@
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
 
-@xliff_check(2)
+@xliff_check(2, version=2)
 def check_xml_declaration(filename, lines):
     """
     CHECK #2: XML Declaration
     Check that the XML declaration is present and exactly matches: <?xml version="1.0" encoding="UTF-8"?>
     Common ChatGPT problems are forgetting to have one, using single quotes, or using lowercase utf-8.
     """
-    print("CHECK #2: check_xml_declaration v2 called for", filename)
+    check_logger.debug("CHECK #2: check_xml_declaration v2 called for %s", filename)
     validation_issues = []
 
     if not lines:
@@ -1,22 +1,24 @@
 from utils import ValidationIssue
 from utils import xliff_check
+from utils import check_logger
+from utils import CheckInput
 
-@xliff_check(5)
-def check_xml_validation(filename, lines):
+@xliff_check(5, version=3, input_kind=CheckInput.DOCUMENT)
+def check_xml_validation(document):
     """
     CHECK #5: XML Validation
     Check the file has no issues (no warnings or validation_issues) using an XML validator
     in the strictest validation mode (all checks enabled).
     """
-    print("CHECK #5: check_xml_validation v2 called for", filename)
+    filename = document.filename
+    check_logger.debug("CHECK #5: check_xml_validation v3 called for %s", filename)
     from lxml import etree
 
     validation_issues = []
-    xml_string = "".join(lines)
+    lines = document.lines
 
     try:
-        parser = etree.XMLParser(recover=False, resolve_entities=True, dtd_validation=False)
-        etree.fromstring(xml_string.encode("utf-8"), parser)
+        document.tree
     except etree.XMLSyntaxError as e:
         line, column = e.position if hasattr(e, "position") else (1, 1)
         validation_issues.append(ValidationIssue(
@@ -0,0 +1,311 @@
+"""
+Translation Memory
+
+Translating an XLIFF file means translating every <source> again, even when the master only changed in a few units.
+TranslationMemory keeps the translations from existing language files (e.g. klms8-messages(es).xlf) in a SQLite
+database, keyed by the hash of the source content and the language, so only new or changed units need translating:
+- lookup() finds an exact match: the same source content as written, whitespace and line layout included, since the
+  stored <target> block mirrors the layout of its source and the target format checks compare it line by line
+- fuzzy_lookup() finds similar sources by character trigram overlap (Dice coefficient, on the normalized text), for a
+  translator to start from
+- translations_for_master() returns the {unit_id: target block} map generate_language_files() (see xliff_translator)
+  takes, plus the units it has no translation for
+
+Translations are stored as the <target> blocks exactly as written in the language file (all lines, indentation
+included), so a hit can be dropped into a generated file unchanged. Targets that aren't translations (empty, or copies
+of the source, see CHECK #10) are not imported. Source and target text are read with UnitIndex from
+the lines of the files; nothing is parsed.
+"""
+
+import argparse
+import hashlib
+import html
+import os
+import re
+import sqlite3
+from dataclasses import dataclass
+
+from utils import configure_logging
+from utils import logger
+from xliff_unit_index import UnitIndex, element_content
+from checks.check_untranslated_targets import untranslated_reason, UNTRANSLATED_UNIT_IDS
+
+# Stored in PRAGMA user_version; a database keyed differently has to be imported again
+KEY_VERSION = 2
+NGRAM_SIZE = 3
+DEFAULT_FUZZY_THRESHOLD = 0.75
+FUZZY_CANDIDATES = 50
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+LANG_PATTERN = re.compile(r'\b(srcLang|trgLang)="([^"]*)"')
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    source_hash TEXT NOT NULL,
+    language TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target_block TEXT NOT NULL,
+    unit_id TEXT,
+    origin TEXT,
+    ngram_count INTEGER NOT NULL,
+    PRIMARY KEY (source_hash, language)
+);
+CREATE TABLE IF NOT EXISTS ngrams (
+    ngram TEXT NOT NULL,
+    language TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    PRIMARY KEY (language, ngram, source_hash)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_source(text):
+    """
+    The form of a source text that is compared for fuzzy matches: runs of whitespace collapsed to one space, ends stripped.
+    """
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def source_hash(text):
+    """
+    The key of a source content, as written (see the module docstring).
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def text_nodes(content):
+    """
+    The non-blank text nodes of an element's content as written, stripped and joined (CHECK #10's view of the text).
+    """
+    return "".join(html.unescape(part).strip() for part in TAG_PATTERN.split(content))
+
+
+def ngrams(text):
+    """
+    The distinct character trigrams of the normalized, lower cased text (the text itself if it is shorter).
+    """
+    text = normalize_source(text).lower()
+    if len(text) <= NGRAM_SIZE:
+        return {text} if text else set()
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+@dataclass
+class FuzzyMatch:
+    """
+    A translation whose source is similar to the one looked up. score is the Dice coefficient of their trigrams (1.0 for
+    the same text).
+    """
+    score: float
+    source: str
+    target_block: str
+    unit_id: str
+
+    @property
+    def target_lines(self):
+        return self.target_block.splitlines(keepends=True)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return f.readlines()
+
+
+def file_languages(lines):
+    """
+    Returns (srcLang, trgLang) from the <xliff> line, None for an attribute that isn't there.
+    """
+    for line in lines:
+        if "<xliff" in line:
+            languages = dict(LANG_PATTERN.findall(line))
+            return languages.get("srcLang"), languages.get("trgLang")
+    return None, None
+
+
+def iter_segments(lines, index=None):
+    """
+    Yields (unit_id, segment, source content, target lines) for every segment of lines with a <source>; the target lines
+    are [] when the segment has no (closed) <target>.
+    """
+    index = index or UnitIndex.build(lines)
+    for segment in range(index.segment_count):
+        source = element_content(lines, index.source_start[segment], index.source_end[segment], "source")
+        if source is None:
+            continue
+        yield index.unit_id_of_segment(segment), segment, source, index.target_lines(lines, segment)
+
+
+class TranslationMemory:
+    """
+    A SQLite backed translation memory (see the module docstring). Use as a context manager, or call close().
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+        key_version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if key_version != KEY_VERSION:
+            if self.connection.execute("SELECT 1 FROM translations LIMIT 1").fetchone():
+                self.connection.close()
+                raise ValueError(f"{db_path} was built by an older version of the translation memory; import the language files into a new one")
+            self.connection.execute(f"PRAGMA user_version = {KEY_VERSION}")
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, source, language, target_block, unit_id=None, origin=None):
+        """
+        Stores (or replaces) the translation of source into language. target_block is the <target> block, as a string
+        or a list of lines.
+        """
+        with self.connection:
+            self._add(source, language, target_block, unit_id, origin)
+
+    def _add(self, source, language, target_block, unit_id, origin):
+        # Writes one translation in the caller's transaction
+        if not isinstance(target_block, str):
+            target_block = "".join(target_block)
+        key = source_hash(source)
+        grams = ngrams(source)
+        self.connection.execute("DELETE FROM ngrams WHERE language = ? AND source_hash = ?", (language, key))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO translations (source_hash, language, source, target_block, unit_id, origin, ngram_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, language, source, target_block, unit_id, origin, len(grams)))
+        self.connection.executemany("INSERT INTO ngrams (ngram, language, source_hash) VALUES (?, ?, ?)",
+                                    [(gram, language, key) for gram in grams])
+
+    def import_file(self, path):
+        """
+        Adds the translations of a language file (one whose trgLang differs from its srcLang). Segments in state "initial",
+        segments without a <target> and segments whose target isn't translated (see untranslated_reason()) are left
+        out. Returns the number of translations added.
+        """
+        lines = read_lines(path)
+        src_lang, trg_lang = file_languages(lines)
+        if not trg_lang or trg_lang == src_lang:
+            logger.info("Skipping %s: not a translated file (srcLang=%s, trgLang=%s)", path, src_lang, trg_lang)
+            return 0
+
+        index = UnitIndex.build(lines)
+        origin = os.path.basename(path)
+        count = 0
+        with self.connection:  # One transaction for the whole file
+            for unit_id, segment, source, target_lines in iter_segments(lines, index):
+                if not target_lines or index.state_of_segment(segment) == "initial":
+                    continue
+                target = element_content(lines, index.target_start[segment], index.target_end[segment], "target")
+                if unit_id not in UNTRANSLATED_UNIT_IDS and untranslated_reason(text_nodes(source), text_nodes(target or "")):
+                    continue
+                self._add(source, trg_lang, target_lines, unit_id, origin)
+                count += 1
+        logger.info("Imported %d translation(s) into %s from %s", count, trg_lang, path)
+        return count
+
+    def lookup(self, source, language):
+        """
+        Returns the stored <target> block (a string) for source in language, or None. Counts a hit or a miss.
+        """
+        row = self.connection.execute("SELECT target_block FROM translations WHERE source_hash = ? AND language = ?",
+                                      (source_hash(source), language)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def fuzzy_lookup(self, source, language, threshold=DEFAULT_FUZZY_THRESHOLD, limit=5):
+        """
+        Returns up to limit FuzzyMatch for source in language with a score of at least threshold, best first.
+
+        The stored sources sharing the most trigrams with source are found through the ngrams index, then scored.
+        """
+        grams = ngrams(source)
+        if not grams:
+            return []
+        placeholders = ",".join("?" * len(grams))
+        rows = self.connection.execute(
+            f"SELECT t.source, t.target_block, t.unit_id, t.ngram_count, c.shared FROM "  # Only the "?" placeholders are formatted in
+            f"(SELECT source_hash, COUNT(*) AS shared FROM ngrams WHERE language = ? AND ngram IN ({placeholders}) "
+            f"GROUP BY source_hash ORDER BY shared DESC LIMIT ?) AS c "
+            f"JOIN translations AS t ON t.source_hash = c.source_hash AND t.language = ?",
+            (language, *grams, FUZZY_CANDIDATES, language)).fetchall()
+
+        matches = []
+        for stored_source, target_block, unit_id, ngram_count, shared in rows:
+            score = 2.0 * shared / (len(grams) + ngram_count)
+            if score >= threshold:
+                matches.append(FuzzyMatch(score, stored_source, target_block, unit_id))
+        matches.sort(key=lambda match: match.score, reverse=True)
+        return matches[:limit]
+
+    def translations_for_master(self, en_path, language):
+        """
+        Looks up every segment of the English master in language. Returns (translations, missing): translations maps
+        unit id to the <target> block lines of each exact match, in the form generate_language_files() takes, and
+        missing lists (unit_id, source) for the segments that still need translating.
+        """
+        translations = {}
+        missing = []
+        for unit_id, _, source, _ in iter_segments(read_lines(en_path)):
+            target_block = self.lookup(source, language)
+            if target_block is None:
+                missing.append((unit_id, source))
+            elif unit_id not in translations:
+                translations[unit_id] = target_block.splitlines(keepends=True)
+        return translations, missing
+
+    def languages(self):
+        """
+        Returns {language: number of translations}.
+        """
+        return dict(self.connection.execute("SELECT language, COUNT(*) FROM translations GROUP BY language ORDER BY language"))
+
+
+def main():
+    """
+    User Entry Point
+
+    Imports language files into a translation memory, shows what it holds, or reports which units of a master it can
+    translate for a language.
+    """
+    parser = argparse.ArgumentParser(description="Manage the XLIFF translation memory.")
+    parser.add_argument("db", help="Path of the translation memory database (created if missing).")
+    parser.add_argument("--import", dest="import_files", nargs="+", metavar="FILE", default=[], help="Language files to add to the memory.")
+    parser.add_argument("--plan", metavar="MASTER", default=None, help="Report which units of this English master the memory can translate.")
+    parser.add_argument("--lang", default=None, help="Language for --plan.")
+    parser.add_argument("--fuzzy", type=float, default=None, metavar="SCORE", help="With --plan, also show fuzzy matches of at least this score for the missing units.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress on stderr.")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    with TranslationMemory(args.db) as memory:
+        for path in args.import_files:
+            print(f"Imported {memory.import_file(path)} translation(s) from {path}")
+
+        if args.plan:
+            if not args.lang:
+                parser.error("--plan needs --lang")
+            translations, missing = memory.translations_for_master(args.plan, args.lang)
+            print(f"{os.path.basename(args.plan)} in {args.lang}: {memory.hits} hit(s), {memory.misses} miss(es)")
+            for unit_id, source in missing:
+                print(f"  needs translation: {unit_id}: {normalize_source(source)[:80]}")
+                if args.fuzzy is not None:
+                    for match in memory.fuzzy_lookup(source, args.lang, threshold=args.fuzzy, limit=1):
+                        print(f"    fuzzy {match.score:.2f} from {match.unit_id}: {normalize_source(match.source)[:80]}")
+
+        for language, count in memory.languages().items():
+            print(f"{language}: {count} translation(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+import logging
 import os
-import re
+
+from xliff_line_signatures import LineSignatures, find_format_mismatches, token_text, WHITESPACE_MISMATCH
 
 
 class Config:
@@ -15,6 +17,48 @@ class Config:
         """
         return cls._TEST_FILES_PATH
 
+    # Private variable to hold whether the XLIFF schema should be compiled when the checks are imported
+    _PRELOAD_SCHEMA = os.environ.get("XLIFF_PRELOAD_SCHEMA", "").lower() in ("1", "true", "yes")
+
+    @classmethod
+    @property
+    def PRELOAD_SCHEMA(cls):
+        """
+        Returns True if check_xliff_schema should compile and cache the XLIFF schema at import time, so batch runs (and
+        worker processes) pay the compile cost up front instead of on the first file. Enable by setting the
+        XLIFF_PRELOAD_SCHEMA environment variable to 1.
+        """
+        return cls._PRELOAD_SCHEMA
+
+
+# All validator logging goes through the "xliff" logger. Library use is silent by default (NullHandler); the command
+# line tools call configure_logging() to show progress (INFO) or per-check detail and timings (DEBUG).
+logger = logging.getLogger("xliff")
+logger.addHandler(logging.NullHandler())
+check_logger = logger.getChild("checks")
+
+_log_handler = None
+
+
+def configure_logging(verbosity=0, stream=None):
+    """
+    Configures the "xliff" logger for command line use.
+
+    Args:
+        verbosity (int): 0 shows warnings only, 1 adds progress messages (INFO), 2 or more adds the per-check
+                         messages and per-check timing lines (DEBUG).
+        stream: Where to write log lines. Defaults to sys.stderr, keeping stdout free for results.
+
+    Calling it again replaces the handler it installed before, so it is safe to call in worker processes.
+    """
+    global _log_handler  # pylint: disable=global-statement
+    if _log_handler is not None:
+        logger.removeHandler(_log_handler)
+    _log_handler = logging.StreamHandler(stream)
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_log_handler)
+    logger.setLevel(logging.WARNING if verbosity <= 0 else logging.INFO if verbosity == 1 else logging.DEBUG)
+
 
 class ValidationIssue:
 
@@ -33,6 +77,13 @@ class ValidationIssue:
                 f"filename={self.filename}, line={self.line}, column_start={self.column_start}, "
                 f"column_end={self.column_end}, unit_id={self.unit_id}, text={self.text})")
 
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a ValidationIssue from a dictionary produced by to_dict().
+        """
+        return cls(**data)
+
     def to_dict(self):
         """
         Converts the ValidationIssue to a dictionary for easier manipulation or logging.
@@ -78,7 +129,116 @@ class ValidationIssue:
         )
 
 
-def xliff_check(number: int, pair: bool=False):
+class CheckTiming:
+    """
+    How long one check took on one file (or file pair), recorded when a validation run is profiled.
+
+    wall_time and cpu_time are in seconds. peak_memory is the peak of Python allocations (tracemalloc) in bytes while the
+    check ran; memory allocated inside lxml's C code isn't traced.
+    """
+
+    def __init__(self, check_name, filename, wall_time, cpu_time, peak_memory, issue_count):
+        self.check_name = check_name
+        self.filename = filename
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_memory = peak_memory
+        self.issue_count = issue_count
+
+    def __repr__(self):
+        return (f"CheckTiming(check_name={self.check_name}, filename={self.filename}, wall_time={self.wall_time}, "
+                f"cpu_time={self.cpu_time}, peak_memory={self.peak_memory}, issue_count={self.issue_count})")
+
+    def to_dict(self):
+        return {
+            'check_name': self.check_name,
+            'filename': self.filename,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'peak_memory': self.peak_memory,
+            'issue_count': self.issue_count
+        }
+
+    @classmethod
+    def table_header(cls):
+        return (
+            "-" * 122 + "\n"
+            "| Check                          | File                          |   Wall ms |    CPU ms |   Peak KiB | Issues |\n"
+            "|--------------------------------|-------------------------------|-----------|-----------|------------|--------|"
+        )
+
+    @classmethod
+    def table_footer(cls):
+        return "-" * 122 + "\n"
+
+    def format_as_table_row(self):
+        return (
+            f"| {self.check_name:<30.30} | "
+            f"{self.filename:<29.29} | "
+            f"{self.wall_time * 1000:>9.2f} | "
+            f"{self.cpu_time * 1000:>9.2f} | "
+            f"{self.peak_memory / 1024:>10.1f} | "
+            f"{self.issue_count:>6} |"
+        )
+
+
+class ValidationReport:
+    """
+    The result of a validation run, with issues grouped by the check that reported them.
+
+    In the default fail-fast mode the report holds the issues of the first failing check. In collect-all mode it holds
+    the issues of every check that ran, and skipped_checks records the checks that couldn't run because a check they
+    depend on (see the requires argument of @xliff_check) failed.
+
+    When created with profile=True, timings collects a CheckTiming for every check run on every file.
+
+    on_issues, if given, is called with (check_name, issues) every time a check's issues are added, so callers can
+    stream them out (e.g. as JSONL or SARIF) while validation is still running.
+    """
+
+    def __init__(self, profile=False, on_issues=None):
+        self.issues_by_check = {}
+        self.skipped_checks = []
+        self.profile = profile
+        self.timings = []
+        self.on_issues = on_issues
+
+    def add(self, check_name, issues):
+        self.issues_by_check.setdefault(check_name, []).extend(issues)
+        if issues and self.on_issues is not None:
+            self.on_issues(check_name, issues)
+
+    def skip(self, check_name, filename, reason):
+        self.skipped_checks.append((check_name, filename, reason))
+
+    @property
+    def issues(self):
+        """
+        All issues as one list, in the order the checks ran.
+        """
+        return [issue for issues in self.issues_by_check.values() for issue in issues]
+
+    def timings_by_wall_time(self):
+        """
+        The recorded timings, slowest first.
+        """
+        return sorted(self.timings, key=lambda timing: timing.wall_time, reverse=True)
+
+
+class CheckInput:
+    """
+    The kinds of input a check function can take, recorded by @xliff_check and used by checks/__init__.py to build
+    the dispatch tables the validator runs from.
+    """
+    # check(file_path): reads the raw file itself, runs before the file is loaded (e.g. UTF-8 BOM)
+    FILE = "file"
+    # check(filename, lines), or check(english_filename, english_lines, translated_filename, translated_lines) for pairs
+    LINES = "lines"
+    # check(document) with an XliffDocument, or check(master_document, translated_document) for pairs
+    DOCUMENT = "document"
+
+
+def xliff_check(number: int, pair: bool=False, version: int=1, requires=(), input_kind: str=CheckInput.LINES):
     """
     Decorator for XLIFF validator check functions.
 
@@ -87,17 +247,33 @@ def xliff_check(number: int, pair: bool=False):
                       Lower numbers run earlier in the pipeline.
         pair (bool): Set to True if the check compares two files (source + target),
                      otherwise defaults to False for single-file checks.
+        version (int): The version of the check's logic. Bump it whenever the check's results
+                       could change for the same input, so cached results are invalidated.
+        requires (tuple[str]): Names of checks that must pass before this check can run meaningfully
+                               (e.g. checks that need well-formed XML require "check_xml_validation").
+                               In collect-all mode the check is skipped if any of them fails.
+        input_kind (str): The kind of input the check takes, one of the CheckInput values.
+                          Defaults to CheckInput.LINES.
 
     Returns:
         function: The original function, with metadata attributes:
-                  _check_number and _check_pair attached for dynamic discovery.
+                  _check_number, _check_pair, _check_version, _check_requires and _check_input
+                  attached for dynamic discovery.
 
     Example:
-        @xliff_check(7)
-        def check_duplicate_ids(filename, lines):
+        @xliff_check(3, version=4)
+        def check_namespace_prefixes(filename, lines):
+            ...
+
+        @xliff_check(1, version=3, input_kind=CheckInput.FILE)
+        def check_utf8_bom(file_path):
             ...
 
-        @xliff_check(15, pair=True)
+        @xliff_check(7, version=14, requires=("check_xml_validation",), input_kind=CheckInput.DOCUMENT)
+        def check_duplicate_ids(document):
+            ...
+
+        @xliff_check(15, pair=True, version=1)
         def check_tag_consistency(src_file, src_lines, tgt_file, tgt_lines):
             ...
     """
@@ -105,6 +281,9 @@ def xliff_check(number: int, pair: bool=False):
     def decorator(func):
         func._check_number = number
         func._check_pair = pair
+        func._check_version = version
+        func._check_requires = tuple(requires)
+        func._check_input = input_kind
         return func
 
     return decorator
@@ -144,15 +323,35 @@ def compare_format_lines(source_lines, target_lines, filename, unit_id, base_lin
         base_line_number (int): Line number used in reporting issues.
         validator_name (str): The name of the validation check.
 
+    Returns:
+        list: A list of ValidationIssue (possibly empty).
+    """
+    lines = list(source_lines) + list(target_lines)
+    return compare_format_signatures(lines, LineSignatures.build(lines), 0, len(source_lines), len(source_lines), len(target_lines),
+                                     filename, unit_id, base_line_number, validator_name)
+
+
+def compare_format_signatures(lines, signatures, source_start, source_count, target_start, target_count, filename, unit_id, base_line_number, validator_name):
+    """
+    Same as compare_format_lines(), for a source block and a target block given as line ranges of a file whose
+    LineSignatures have already been computed, so whole-file callers don't re-analyze each line per comparison.
+
+    Parameters:
+        lines (list of str): The lines of the file (only read for the issue text of mismatching lines).
+        signatures (LineSignatures): The signatures of lines.
+        source_start, source_count (int): The 0-based first line and the line count of the source block.
+        target_start, target_count (int): The same for the target block.
+        filename, unit_id, base_line_number, validator_name: As for compare_format_lines().
+
     Returns:
         list: A list of ValidationIssue (possibly empty).
     """
     issues = []
 
-    if len(source_lines) != len(target_lines):
+    if source_count != target_count:
         issues.append(ValidationIssue(
             validator=validator_name,
-            message=f"Mismatch in line count: source={len(source_lines)} lines, target={len(target_lines)} lines.",
+            message=f"Mismatch in line count: source={source_count} lines, target={target_count} lines.",
             filename=filename,
             line=base_line_number,
             column_start=1,
@@ -162,49 +361,23 @@ def compare_format_lines(source_lines, target_lines, filename, unit_id, base_lin
         ))
         return issues
 
-    for j in range(len(source_lines)):
-        src_line = source_lines[j]
-        tgt_line = target_lines[j]
-
-        src_strip = src_line.strip()
-        tgt_strip = tgt_line.strip()
-
-        src_leading = re.match(r"^\s*", src_line).group()
-        tgt_leading = re.match(r"^\s*", tgt_line).group()
-        src_trailing = re.search(r"\s*$", src_line).group()
-        tgt_trailing = re.search(r"\s*$", tgt_line).group()
-
-        if src_leading != tgt_leading or src_trailing != tgt_trailing:
-            issues.append(ValidationIssue(
-                validator=validator_name,
-                message=f"Line {j+1} has different whitespace formatting in target.",
-                filename=filename,
-                line=base_line_number,
-                column_start=1,
-                column_end=1,
-                unit_id=unit_id,
-                text=tgt_line.strip()
-            ))
-            continue
-
-        src_tag = re.match(r"<\/?\w+", src_strip)
-        tgt_tag = re.match(r"<\/?\w+", tgt_strip)
-
-        if src_tag and tgt_tag:
-            src_val = src_tag.group()
-            tgt_val = tgt_tag.group()
-            if not ((src_val == "<source" and tgt_val == "<target") or
-                    (src_val == "</source" and tgt_val == "</target") or
-                    (src_val == tgt_val)):
-                issues.append(ValidationIssue(
-                    validator=validator_name,
-                    message=f"Line {j+1} starts with different tag: source='{src_val}', target='{tgt_val}'",
-                    filename=filename,
-                    line=base_line_number,
-                    column_start=1,
-                    column_end=1,
-                    unit_id=unit_id,
-                    text=tgt_line.strip()
-                ))
+    for j, kind in find_format_mismatches(signatures, source_start, signatures, target_start, source_count):
+        tgt_line = lines[target_start + j]
+        if kind == WHITESPACE_MISMATCH:
+            message = f"Line {j+1} has different whitespace formatting in target."
+        else:
+            src_val = token_text(signatures.tag[source_start + j])
+            tgt_val = token_text(signatures.tag[target_start + j])
+            message = f"Line {j+1} starts with different tag: source='{src_val}', target='{tgt_val}'"
+        issues.append(ValidationIssue(
+            validator=validator_name,
+            message=message,
+            filename=filename,
+            line=base_line_number,
+            column_start=1,
+            column_end=1,
+            unit_id=unit_id,
+            text=tgt_line.strip()
+        ))
 
     return issues
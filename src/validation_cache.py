@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from utils import ValidationIssue
+
+
+class ValidationCache:
+    """
+    On-disk cache of check results, so re-validating an unchanged file returns its issues without re-running the checks.
+
+    Each entry is keyed by the check's name and version (from @xliff_check), the SHA-256 of every input file, the input
+    file names (some checks, like CHECK #4, depend on the name) and the SHA-256 of the XLIFF schema files (the schema
+    and the schemas it imports, such as xml.xsd). Changing a file, bumping a check's version or editing the schema
+    therefore misses the cache and re-runs only the affected checks.
+
+    Entries are small JSON files written atomically, so several worker processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir, schema_path=None):
+        from checks.check_xliff_schema import default_schema_path
+
+        self.cache_dir = cache_dir
+        self.schema_path = schema_path or default_schema_path()
+        self._schema_hash = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def schema_hash(self):
+        if self._schema_hash is None:
+            from checks.check_xliff_schema import schema_files
+
+            digest = hashlib.sha256()
+            try:
+                files = schema_files(self.schema_path)
+                for path in files:
+                    with open(path, "rb") as f:
+                        digest.update(os.path.basename(path).encode("utf-8") + b"\0" + hashlib.sha256(f.read()).digest())
+                self._schema_hash = digest.hexdigest() if files else ""
+            except OSError:
+                self._schema_hash = ""
+        return self._schema_hash
+
+    def key(self, check, documents):
+        """
+        Returns the cache key for running check against documents (a list of XliffDocument, one for single file checks,
+        master and translated for file pair checks).
+        """
+        parts = [check.__name__, str(check._check_version), self.schema_hash]
+        for document in documents:
+            parts.append(document.filename)
+            parts.append(document.sha256)
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Returns the cached list of ValidationIssue for key, or None if there is no (readable) entry.
+        """
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                issues = [ValidationIssue.from_dict(data) for data in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return issues
+
+    def put(self, key, issues):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump([issue.to_dict() for issue in issues], f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def run(self, check, documents, run_check):
+        """
+        Returns the cached issues for check on documents, calling run_check() and caching its result on a miss.
+        """
+        key = self.key(check, documents)
+        issues = self.get(key)
+        if issues is None:
+            issues = run_check()
+            self.put(key, issues)
+        return issues
@@ -0,0 +1,142 @@
+import json
+import os
+import pathlib
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_VERSION = "2.1.0"
+TOOL_NAME = "KLMS XLIFF 2.0 Validator"
+
+# One shared encoder; json.dumps() builds a new one per call when options are passed
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+class JsonlIssueWriter:
+    """
+    Writes ValidationIssue objects as JSON Lines (one to_dict() object per line) as they are produced, so output for
+    thousands of files never has to be held in memory.
+
+    Example:
+        with open("issues.jsonl", "w", encoding="utf-8") as out:
+            writer = JsonlIssueWriter(out)
+            writer.write_issues(validate_xliff_file(path))
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, issue, uri=None):
+        """
+        Writes one issue. If uri is given (e.g. the full path of the validated file) it is added as a "uri" member.
+        """
+        data = issue.to_dict()
+        if uri:
+            data["uri"] = uri
+        self.stream.write(_encoder.encode(data))
+        self.stream.write("\n")
+        self.count += 1
+
+    def write_issues(self, issues, uri=None):
+        for issue in issues:
+            self.write(issue, uri)
+
+    def close(self):
+        self.stream.flush()
+
+
+class SarifIssueWriter:
+    """
+    Writes ValidationIssue objects as a SARIF 2.1.0 log for editor and CI integration.
+
+    Results are streamed to the output as they are written. The rule table is emitted after the results when the writer
+    is closed (JSON object members are unordered, so this is still a valid log), so only the distinct rule names are kept
+    in memory. close() must be called to complete the document.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+        self._rules = {}
+        self.stream.write(f'{{"$schema":"{SARIF_SCHEMA}","version":"{SARIF_VERSION}","runs":[{{"results":[')
+
+    def write(self, issue, uri=None):
+        """
+        Writes one issue. uri is the artifact location to report (defaults to the issue's filename).
+        """
+        rule_id = issue.validator
+        if rule_id not in self._rules:
+            self._rules[rule_id] = len(self._rules)
+
+        uri = uri or issue.filename
+        if os.path.isabs(uri):
+            uri = pathlib.Path(uri).as_uri()
+        physical_location = {"artifactLocation": {"uri": uri}}
+        if isinstance(issue.line, int) and issue.line > 0:
+            region = {"startLine": issue.line}
+            if isinstance(issue.column_start, int) and issue.column_start > 0:
+                region["startColumn"] = issue.column_start
+                # column_end is inclusive and SARIF's endColumn exclusive; column 1 to 1 means the column isn't known
+                if isinstance(issue.column_end, int) and issue.column_end >= issue.column_start and (issue.column_start, issue.column_end) != (1, 1):
+                    region["endColumn"] = issue.column_end + 1
+            physical_location["region"] = region
+
+        result = {
+            "ruleId": rule_id,
+            "ruleIndex": self._rules[rule_id],
+            "level": "error",
+            "message": {"text": issue.message},
+            "locations": [{"physicalLocation": physical_location}],
+            "properties": {"unitId": issue.unit_id, "text": issue.text},
+        }
+        if self.count:
+            self.stream.write(",")
+        self.stream.write(_encoder.encode(result))
+        self.count += 1
+
+    def write_issues(self, issues, uri=None):
+        for issue in issues:
+            self.write(issue, uri)
+
+    def close(self):
+        rules = [{"id": rule_id, "name": rule_id} for rule_id in self._rules]
+        tool = {"driver": {"name": TOOL_NAME, "rules": rules}}
+        self.stream.write(f'],"tool":{_encoder.encode(tool)}}}]}}\n')
+        self.stream.flush()
+
+
+def open_issue_writers(jsonl_path=None, sarif_path=None):
+    """
+    Opens the requested output files and returns a list of (writer, file) pairs; see close_issue_writers().
+    """
+    writers = []
+    if jsonl_path:
+        f = open(jsonl_path, "w", encoding="utf-8")  # noqa: SIM115
+        writers.append((JsonlIssueWriter(f), f))
+    if sarif_path:
+        f = open(sarif_path, "w", encoding="utf-8")  # noqa: SIM115
+        writers.append((SarifIssueWriter(f), f))
+    return writers
+
+
+def close_issue_writers(writers):
+    for writer, f in writers:
+        writer.close()
+        f.close()
+
+
+def issue_path(issue, filepaths):
+    """
+    Returns the full path among filepaths whose base name is the issue's filename (issues only carry the base name),
+    or None if there isn't one.
+    """
+    return next((path for path in filepaths if path and os.path.basename(path) == issue.filename), None)
+
+
+def write_issues(writers, issues, filepaths):
+    """
+    Writes issues to every writer from open_issue_writers(), resolving each issue's full path from filepaths.
+    """
+    for issue in issues:
+        uri = issue_path(issue, filepaths)
+        for writer, _ in writers:
+            writer.write(issue, uri)
@@ -0,0 +1,314 @@
+"""
+XLIFF Validator Benchmarks
+
+Measures how fast the validator runs so performance work can be compared against a recorded baseline instead of guessed.
+
+The benchmark runs over the bundled test-files corpus (the klms8-messages(*).xlf files and the MCB_OTPS_L01_Storyline
+pair) and over synthetically scaled copies of it (every <file>'s units repeated 10x, 100x, ... with unique unit ids; see
+xliff_corpus_generator.write_scaled_file()).
+For every file and scale it times:
+- loading the file (reading, decoding and parsing it into an XliffDocument)
+- every single file check, and every file pair check for the (en)/(xx) pairs, against an already loaded document
+- the full validate_xliff_file() and validate_xliff_file_pair() flows in collect-all mode
+
+Each case runs several times and the best time is kept. Results are reported as units/sec and MB/sec, can be saved as a
+JSON baseline, and compared against a saved baseline with a regression threshold (the exit status is 1 if any case got
+slower by more than the threshold). Baselines are only comparable on the same machine.
+
+Usage (from src/):
+    python xliff_benchmark.py --save-baseline bench-baseline.json
+    python xliff_benchmark.py --baseline bench-baseline.json --threshold 0.10
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from utils import Config
+from utils import logger
+from utils import configure_logging
+from xliff_document import XliffDocument
+from xliff_corpus_generator import write_scaled_file
+from xliff_validator import validate_xliff_file, validate_xliff_file_pair
+from checks import RAW_FILE_CHECK_DISPATCH, DOCUMENT_CHECK_DISPATCH, FILE_PAIR_CHECK_DISPATCH
+
+BENCHMARK_MASTERS = ["klms8-messages(en).xlf", "MCB_OTPS_L01_Storyline(en).xlf"]
+BENCHMARK_FILES = [
+    "klms8-messages(en).xlf",
+    "klms8-messages(es).xlf",
+    "klms8-messages(hmn).xlf",
+    "klms8-messages(ksw-Mymr).xlf",
+    "klms8-messages(so).xlf",
+    "MCB_OTPS_L01_Storyline(en).xlf",
+    "MCB_OTPS_L01_Storyline(es).xlf",
+]
+BENCHMARK_PAIRS = [
+    ("klms8-messages(en).xlf", "klms8-messages(es).xlf"),
+    ("MCB_OTPS_L01_Storyline(en).xlf", "MCB_OTPS_L01_Storyline(es).xlf"),
+]
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+
+class BenchmarkResult:
+    """
+    The best time of one benchmark case, with the amount of work it did so it can be reported as throughput.
+
+    name identifies the case across runs (e.g. "check:check_duplicate_ids:klms8-messages(en).xlf:x10") and is the key
+    used for baseline comparison. seconds is the best of the repeated runs; units and size_bytes are the total <unit>
+    count and file size of the input (both files for a pair).
+    """
+
+    def __init__(self, name, kind, target, scale, seconds, units, size_bytes):
+        self.name = name
+        self.kind = kind
+        self.target = target
+        self.scale = scale
+        self.seconds = seconds
+        self.units = units
+        self.size_bytes = size_bytes
+
+    def __repr__(self):
+        return (f"BenchmarkResult(name={self.name}, seconds={self.seconds}, units={self.units}, "
+                f"size_bytes={self.size_bytes})")
+
+    @property
+    def units_per_second(self):
+        return self.units / self.seconds if self.seconds > 0 else float("inf")
+
+    @property
+    def mb_per_second(self):
+        return self.size_bytes / (1024 * 1024) / self.seconds if self.seconds > 0 else float("inf")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['kind'], data['target'], data['scale'], data['seconds'], data['units'], data['size_bytes'])
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'target': self.target,
+            'scale': self.scale,
+            'seconds': self.seconds,
+            'units': self.units,
+            'size_bytes': self.size_bytes
+        }
+
+    @classmethod
+    def table_header(cls):
+        return (
+            "-" * 134 + "\n"
+            "| Case                           | File                          | Scale |   Units |     Best ms |    Units/sec |     MB/sec |\n"
+            "|--------------------------------|-------------------------------|-------|---------|-------------|--------------|------------|"
+        )
+
+    @classmethod
+    def table_footer(cls):
+        return "-" * 134 + "\n"
+
+    def format_as_table_row(self):
+        return (
+            f"| {self.kind:<30.30} | "
+            f"{self.target:<29.29} | "
+            f"{'x' + str(self.scale):>5} | "
+            f"{self.units:>7} | "
+            f"{self.seconds * 1000:>11.2f} | "
+            f"{self.units_per_second:>12.0f} | "
+            f"{self.mb_per_second:>10.2f} |"
+        )
+
+
+def _best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _load_warm_document(filepath):
+    # Loads a document and builds its lines and tree up front, so check timings exclude decoding and parsing
+    document = XliffDocument.load(filepath)
+    try:
+        _ = document.lines
+        _ = document.recovered_tree
+    except UnicodeDecodeError:
+        pass
+    return document
+
+
+def benchmark_file(filepath, scale, repeat, include_checks=True):
+    """
+    Benchmarks loading filepath, each single file check on it, and validate_xliff_file() on it. Returns a list of
+    BenchmarkResult.
+    """
+    filename = os.path.basename(filepath)
+    document = _load_warm_document(filepath)
+    units = len(document.units)
+    size_bytes = len(document.raw_bytes)
+
+    def result(kind, seconds):
+        return BenchmarkResult(f"{kind}:{filename}:x{scale}", kind, filename, scale, seconds, units, size_bytes)
+
+    results = [result("load", _best_time(lambda: _load_warm_document(filepath), repeat))]
+    if include_checks:
+        for check, arguments in RAW_FILE_CHECK_DISPATCH + DOCUMENT_CHECK_DISPATCH:
+            results.append(result(check.__name__, _best_time(lambda c=check, a=arguments: c(*a(filepath, document)), repeat)))
+    results.append(result("validate_xliff_file", _best_time(lambda: validate_xliff_file(filepath, collect_all=True), repeat)))
+    return results
+
+
+def benchmark_file_pair(master_filepath, translated_filepath, scale, repeat, include_checks=True):
+    """
+    Benchmarks each file pair check and validate_xliff_file_pair() (without re-validating the master) on a file pair.
+    Returns a list of BenchmarkResult; throughput counts the units and bytes of both files.
+    """
+    translated_filename = os.path.basename(translated_filepath)
+    master_document = _load_warm_document(master_filepath)
+    translated_document = _load_warm_document(translated_filepath)
+    units = len(master_document.units) + len(translated_document.units)
+    size_bytes = len(master_document.raw_bytes) + len(translated_document.raw_bytes)
+
+    def result(kind, seconds):
+        return BenchmarkResult(f"{kind}:{translated_filename}:x{scale}", kind, translated_filename, scale, seconds, units, size_bytes)
+
+    results = []
+    if include_checks:
+        for check, arguments in FILE_PAIR_CHECK_DISPATCH:
+            results.append(result(check.__name__, _best_time(lambda c=check, a=arguments: c(*a(master_document, translated_document)), repeat)))
+    results.append(result("validate_xliff_file_pair", _best_time(
+        lambda: validate_xliff_file_pair(master_filepath, translated_filepath, validate_master=False, collect_all=True), repeat)))
+    return results
+
+
+def run_benchmarks(test_files_dir=None, scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, include_checks=True, work_dir=None):
+    """
+    Runs the benchmark cases over the corpus in test_files_dir at each scale.
+
+    Args:
+        test_files_dir (str): Folder holding the benchmark files. Defaults to Config.TEST_FILES_PATH.
+        scales (iterable[int]): Scale factors; 1 benchmarks the files as they are.
+        repeat (int): Runs per case; the best time is kept.
+        include_checks (bool): Also time every check on its own, not just the load and the full validation flows.
+        work_dir (str): Where to write the scaled files. Defaults to a temporary folder that is removed afterwards.
+
+    Returns:
+        list[BenchmarkResult]: One result per case, in run order.
+    """
+    test_files_dir = test_files_dir or Config.TEST_FILES_PATH
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="xliff-bench-")
+
+    results = []
+    try:
+        for scale in scales:
+            if scale == 1:
+                scale_dir = test_files_dir
+            else:
+                scale_dir = os.path.join(work_dir, f"x{scale}")
+                os.makedirs(scale_dir, exist_ok=True)
+                for filename in BENCHMARK_FILES:
+                    write_scaled_file(os.path.join(test_files_dir, filename), scale, scale_dir)
+
+            for filename in BENCHMARK_FILES:
+                logger.info("Benchmarking %s at x%d", filename, scale)
+                results.extend(benchmark_file(os.path.join(scale_dir, filename), scale, repeat, include_checks))
+            for master_filename, translated_filename in BENCHMARK_PAIRS:
+                logger.info("Benchmarking %s against %s at x%d", translated_filename, master_filename, scale)
+                results.extend(benchmark_file_pair(os.path.join(scale_dir, master_filename), os.path.join(scale_dir, translated_filename),
+                                                   scale, repeat, include_checks))
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"results": [result.to_dict() for result in results]}, f, indent=2)
+
+
+def load_baseline(path):
+    """
+    Reads a baseline written by save_baseline() and returns a dict of case name to BenchmarkResult.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {result.name: result for result in map(BenchmarkResult.from_dict, data["results"])}
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares results against a baseline from load_baseline().
+
+    Returns a list of (result, baseline_result, change) for every case present in both, where change is the relative
+    change in time (0.25 means 25% slower, -0.5 means twice as fast), and the subset of those slower than threshold.
+    """
+    comparisons = []
+    for result in results:
+        baseline_result = baseline.get(result.name)
+        if baseline_result is not None and baseline_result.seconds > 0:
+            comparisons.append((result, baseline_result, result.seconds / baseline_result.seconds - 1))
+    regressions = [comparison for comparison in comparisons if comparison[2] > threshold]
+    return comparisons, regressions
+
+
+def print_results(results):
+    print(BenchmarkResult.table_header())
+    for result in results:
+        print(result.format_as_table_row())
+    print(BenchmarkResult.table_footer())
+
+
+def print_comparison(comparisons, threshold):
+    print(f"Compared with baseline (regression threshold {threshold:.0%}):")
+    for result, baseline_result, change in comparisons:
+        marker = "REGRESSION" if change > threshold else "faster" if change < -threshold else ""
+        print(f"  {result.name:<70.70} {baseline_result.seconds * 1000:>10.2f} ms -> {result.seconds * 1000:>10.2f} ms {change:>+8.1%} {marker}")
+
+
+def main():
+    """
+    User Entry Point
+
+    Runs the benchmarks, prints the throughput table, and optionally saves a baseline or checks for regressions against
+    one. Exits with status 1 if any case regressed by more than the threshold.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the XLIFF validator over the test-files corpus.")
+    parser.add_argument("--test-files", default=None, help="Folder holding the benchmark files (default: the bundled test-files).")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)), help="Comma separated scale factors (default: %(default)s).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per case; the best time is kept (default: %(default)s).")
+    parser.add_argument("--flows-only", action="store_true", help="Only time loading and the full validation flows, not each check.")
+    parser.add_argument("--work-dir", default=None, help="Keep the scaled files in this folder instead of a temporary one.")
+    parser.add_argument("--save-baseline", metavar="PATH", default=None, help="Save the results as a baseline to this file.")
+    parser.add_argument("--baseline", metavar="PATH", default=None, help="Compare the results against this baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slow down that counts as a regression (default: %(default)s).")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress on stderr.")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale.strip()]
+    results = run_benchmarks(args.test_files, scales=scales, repeat=args.repeat, include_checks=not args.flows_only, work_dir=args.work_dir)
+    print_results(results)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        comparisons, regressions = compare_to_baseline(results, load_baseline(args.baseline), args.threshold)
+        print_comparison(comparisons, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""
+Synthetic XLIFF 2.0 Corpus Generator
+
+The bundled test files are small (the klms8-messages files have ~250 units, the Storyline export 524), so this module
+builds arbitrarily large inputs for benchmarks and stress tests:
+- generate_corpus() writes N file sets of M units each: an (en) master plus one pseudo-translated file per language. The
+  units are copied from a template master (e.g. klms8-messages(en).xlf or the Storyline export) or, without a master,
+  from built-in templates covering plain text, Java placeholders, and nested <pc>/<ph> with matching <originalData>.
+  Unit ids are made unique, and the formatting of every line is kept, so the generated files pass validation.
+- write_corrupted_variants() writes, for each check, a copy of a file pair in which the translated file has been broken
+  in a way that trips that check (see CORRUPTIONS).
+- scale_xliff_lines() / write_scaled_file() repeat the units of an existing file in place (used by xliff_benchmark).
+
+Translated targets are pseudo-localized: every ASCII letter in the target's text is swapped for an accented look-alike,
+leaving markup, entities and Java placeholders alone, so targets differ from their sources but keep their structure.
+
+Usage (from src/):
+    python xliff_corpus_generator.py /tmp/corpus --files 4 --units 10000 --languages es,so --corrupt
+    python xliff_corpus_generator.py /tmp/corpus --master "../test-files/MCB_OTPS_L01_Storyline(en).xlf" --units 50000
+"""
+
+import os
+import re
+import shutil
+import argparse
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+XLIFF_NS = "urn:oasis:names:tc:xliff:document:2.0"
+BOM = "\ufeff"
+DEFAULT_STEM = "synthetic-messages"
+DEFAULT_LANGUAGES = ("es",)
+DEFAULT_UNITS_PER_FILE_ELEMENT = 100
+
+UNIT_ID_PATTERN = re.compile(r'(<unit\b[^>]*?\bid=")([^"]*)(")')
+# Markup, entities and Java placeholders are kept as is when pseudo-localizing; everything between them is text
+PROTECTED_PATTERN = re.compile(r'(<[^>]*>|&[#\w]+;|\{[^}]*\})')
+PSEUDO_LOCALIZATION = str.maketrans(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "áƀçďéƒğĥíĵķĺɱñóƥʠřšťúʋŵẋýžÁƁÇĎÉƑĞĤÍĴĶĹṀÑÓƤǪŘŠŤÚƲŴẊÝŽ"
+)
+
+# Built-in unit templates, used when no template master is given. Their targets are copies of their sources, as in an
+# (en) master.
+SYNTHETIC_UNIT_TEMPLATES = [
+    [
+        '        <unit canResegment="no" id="synthetic.text">\n',
+        '            <segment canResegment="no" state="final">\n',
+        '                <source xml:space="preserve">Your session is about to expire.</source>\n',
+        '                <target xml:space="preserve">Your session is about to expire.</target>\n',
+        '            </segment>\n',
+        '        </unit>\n',
+    ],
+    [
+        '        <unit canResegment="no" id="synthetic.java">\n',
+        '            <segment canResegment="no" state="final">\n',
+        '                <source xml:space="preserve">Showing {0} of {1} results for &quot;{2}&quot;.</source>\n',
+        '                <target xml:space="preserve">Showing {0} of {1} results for &quot;{2}&quot;.</target>\n',
+        '            </segment>\n',
+        '        </unit>\n',
+    ],
+    [
+        '        <unit canResegment="no" id="synthetic.html">\n',
+        '            <originalData>\n',
+        '                <data id="p_1_start">&lt;p&gt;</data>\n',
+        '                <data id="p_1_end">&lt;/p&gt;</data>\n',
+        '                <data id="strong_2_start">&lt;strong&gt;</data>\n',
+        '                <data id="strong_2_end">&lt;/strong&gt;</data>\n',
+        '                <data id="br_3">&lt;br/&gt;</data>\n',
+        '            </originalData>\n',
+        '            <segment canResegment="no" state="final">\n',
+        '                <source xml:space="preserve"><pc id="p_1" dataRefStart="p_1_start" dataRefEnd="p_1_end">Select <pc id="strong_2" dataRefStart="strong_2_start" dataRefEnd="strong_2_end">Save</pc> to keep {0} changes.<ph id="br_3" dataRef="br_3" />Unsaved changes are lost.</pc></source>\n',
+        '                <target xml:space="preserve"><pc id="p_1" dataRefStart="p_1_start" dataRefEnd="p_1_end">Select <pc id="strong_2" dataRefStart="strong_2_start" dataRefEnd="strong_2_end">Save</pc> to keep {0} changes.<ph id="br_3" dataRef="br_3" />Unsaved changes are lost.</pc></target>\n',
+        '            </segment>\n',
+        '        </unit>\n',
+    ],
+    [
+        '        <unit canResegment="no" id="synthetic.storyline" type="Articulate:DocumentState">\n',
+        '            <originalData>\n',
+        '                <data id="generic_1">&lt;Style DefaultTabStop="53.7600021" /&gt;</data>\n',
+        '                <data id="span_2">&lt;Style FontFamily="+minor" FontSize="9.36" FontIsBold="True" /&gt;</data>\n',
+        '                <data id="span_3">&lt;Style FontFamily="+minor" FontSize="9.36" FontIsBold="False" /&gt;</data>\n',
+        '            </originalData>\n',
+        '            <segment canResegment="no" state="final">\n',
+        '                <source>\n',
+        '                    <pc id="block_0">\n',
+        '                        <ph dataRef="generic_1" id="generic_1" />\n',
+        '                        <pc dataRefStart="span_2" id="span_2">Lesson One: </pc>\n',
+        '                        <pc dataRefStart="span_3" id="span_3">History and Overview </pc>\n',
+        '                    </pc>\n',
+        '                </source>\n',
+        '                <target>\n',
+        '                    <pc id="block_0">\n',
+        '                        <ph dataRef="generic_1" id="generic_1" />\n',
+        '                        <pc dataRefStart="span_2" id="span_2">Lesson One: </pc>\n',
+        '                        <pc dataRefStart="span_3" id="span_3">History and Overview </pc>\n',
+        '                    </pc>\n',
+        '                </target>\n',
+        '            </segment>\n',
+        '        </unit>\n',
+    ],
+]
+
+
+def read_xliff_lines(filepath):
+    """
+    Reads an XLIFF file as a list of lines. A UTF-8 BOM is kept as a leading "\\ufeff" on the first line, so writing the
+    lines back with write_xliff_lines() reproduces the file.
+    """
+    with open(filepath, encoding="utf-8", newline="") as f:
+        return f.readlines()
+
+
+def write_xliff_lines(filepath, lines):
+    with open(filepath, "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+
+
+def split_units(lines):
+    """
+    Returns the <unit> blocks in lines as a list of (first_index, lines) with 0-based indices, in file order.
+    """
+    units = []
+    block = None
+    for i, line in enumerate(lines):
+        if block is None and "<unit" in line:
+            block = (i, [])
+        if block is not None:
+            block[1].append(line)
+            if "</unit>" in line:
+                units.append(block)
+                block = None
+    return units
+
+
+def read_unit_templates(filepath):
+    """
+    Returns the <unit> blocks of a master file that can be used as templates for generate_corpus().
+
+    Units whose source has no letters (e.g. only a placeholder) are left out: pseudo-localization can't change them, so
+    they would read as untranslated (CHECK #10) in the generated translated files.
+    """
+    templates = []
+    for _, unit_lines in split_units(read_xliff_lines(filepath)):
+        source_text = PROTECTED_PATTERN.sub("", "".join(_block_lines(unit_lines, "source")))
+        if re.search(r"[A-Za-z]", source_text):
+            templates.append(unit_lines)
+    return templates
+
+
+def _block_lines(unit_lines, tag):
+    # The lines from <tag ...> to </tag> in a unit block, or [] if the unit has no such element
+    start = next((i for i, line in enumerate(unit_lines) if f"<{tag}" in line), None)
+    if start is None:
+        return []
+    for end in range(start, len(unit_lines)):
+        if f"</{tag}>" in unit_lines[end] or (end == start and unit_lines[end].rstrip().endswith("/>")):
+            return unit_lines[start:end + 1]
+    return unit_lines[start:]
+
+
+def pseudo_localize(text):
+    """
+    Swaps every ASCII letter outside of markup, entities and Java placeholders for an accented look-alike.
+    """
+    return "".join(part if i % 2 else part.translate(PSEUDO_LOCALIZATION) for i, part in enumerate(PROTECTED_PATTERN.split(text)))
+
+
+def pseudo_translate_unit(unit_lines):
+    """
+    Returns a copy of a unit block with the text of its <target> elements pseudo-localized. The target's markup spans
+    lines, so the whole target is transformed at once; newlines and whitespace are kept, so the lines still line up.
+    """
+    translated = []
+    target = None
+    for line in unit_lines:
+        if target is None and "<target" in line:
+            target = []
+        if target is None:
+            translated.append(line)
+            continue
+        target.append(line)
+        if "</target>" in line:
+            translated.extend(pseudo_localize("".join(target)).splitlines(keepends=True))
+            target = None
+    if target:
+        translated.extend(target)
+    return translated
+
+
+def renumber_unit(unit_lines, unit_id):
+    """
+    Returns a copy of a unit block with its id set to unit_id.
+    """
+    return [UNIT_ID_PATTERN.sub(lambda m: f"{m.group(1)}{unit_id}{m.group(3)}", unit_lines[0], count=1)] + unit_lines[1:]
+
+
+def generate_units(templates, count, id_prefix=""):
+    """
+    Yields count unit blocks made by cycling through templates, each with a unique id (the template's id followed by
+    the unit's number).
+    """
+    for n in range(count):
+        template = templates[n % len(templates)]
+        original_id = UNIT_ID_PATTERN.search(template[0])
+        base_id = original_id.group(2) if original_id else "unit"
+        yield renumber_unit(template, f"{id_prefix}{base_id}-{n}")
+
+
+def build_xliff_lines(unit_blocks, target_language, source_language="en", units_per_file_element=DEFAULT_UNITS_PER_FILE_ELEMENT, file_id_prefix="synthetic"):
+    """
+    Wraps unit blocks into a complete XLIFF 2.0 file (BOM, declaration, <xliff> and <file> elements) laid out like the
+    KLMS files. Units are split across <file> elements of at most units_per_file_element units each.
+    """
+    lines = [
+        BOM + XML_DECLARATION + "\n",
+        f'<xliff xmlns="{XLIFF_NS}" version="2.0" srcLang="{source_language}" trgLang="{target_language}">\n',
+    ]
+    file_number = 0
+    in_file = 0
+    for unit_lines in unit_blocks:
+        if in_file == 0:
+            lines.append(f'    <file canResegment="no" id="{file_id_prefix}.{file_number}">\n')
+        lines.extend(unit_lines)
+        in_file += 1
+        if in_file == units_per_file_element:
+            lines.append('    </file>\n')
+            file_number += 1
+            in_file = 0
+    if in_file:
+        lines.append('    </file>\n')
+    lines.append('</xliff>\n')
+    return lines
+
+
+def generate_corpus(out_dir, master_filepath=None, file_count=1, unit_count=1000, languages=DEFAULT_LANGUAGES,
+                    units_per_file_element=DEFAULT_UNITS_PER_FILE_ELEMENT, stem=DEFAULT_STEM):
+    """
+    Writes a synthetic corpus to out_dir.
+
+    Args:
+        out_dir (str): Folder to write to (created if needed).
+        master_filepath (str): A master XLIFF file whose units are used as templates. Defaults to the built-in templates.
+        file_count (int): Number of file sets. File set k is named {stem}-{k}(xx).xlf.
+        unit_count (int): Units in each file.
+        languages (iterable[str]): Target languages; each file set gets an (en) master plus one file per language.
+        units_per_file_element (int): Units per <file> element.
+        stem (str): File name stem.
+
+    Returns:
+        list[tuple[str, list[str]]]: (master_filepath, translated_filepaths) for each file set.
+    """
+    templates = read_unit_templates(master_filepath) if master_filepath else SYNTHETIC_UNIT_TEMPLATES
+    if not templates:
+        msg = f"No usable units in {master_filepath}"
+        raise ValueError(msg)
+    os.makedirs(out_dir, exist_ok=True)
+
+    file_sets = []
+    for k in range(file_count):
+        master_units = list(generate_units(templates, unit_count))
+        file_id_prefix = f"{stem}-{k}"
+        master_path = os.path.join(out_dir, f"{stem}-{k}(en).xlf")
+        write_xliff_lines(master_path, build_xliff_lines(master_units, "en", units_per_file_element=units_per_file_element, file_id_prefix=file_id_prefix))
+
+        translated_units = [pseudo_translate_unit(unit_lines) for unit_lines in master_units]
+        translated_paths = []
+        for language in languages:
+            translated_path = os.path.join(out_dir, f"{stem}-{k}({language}).xlf")
+            write_xliff_lines(translated_path, build_xliff_lines(translated_units, language, units_per_file_element=units_per_file_element, file_id_prefix=file_id_prefix))
+            translated_paths.append(translated_path)
+        file_sets.append((master_path, translated_paths))
+    return file_sets
+
+
+def _replace_first(lines, predicate, change):
+    # Applies change to the first line matching predicate; returns None when there is no such line
+    for i, line in enumerate(lines):
+        if predicate(line):
+            return lines[:i] + [change(line)] + lines[i + 1:]
+    return None
+
+
+def _remove_bom(lines):
+    return [lines[0].removeprefix(BOM)] + lines[1:] if lines and lines[0].startswith(BOM) else None
+
+
+def _single_quoted_declaration(lines):
+    return _replace_first(lines, lambda line: "<?xml" in line, lambda line: line.replace('"', "'").replace("UTF-8", "utf-8"))
+
+
+def _prefixed_segment(lines):
+    start = next((i for i, line in enumerate(lines) if "<segment" in line), None)
+    if start is None:
+        return None
+    end = next(i for i in range(start, len(lines)) if "</segment>" in lines[i])
+    lines = list(lines)
+    lines[start] = lines[start].replace("<segment", f'<ns0:segment xmlns:ns0="{XLIFF_NS}"', 1)
+    lines[end] = lines[end].replace("</segment>", "</ns0:segment>", 1)
+    return lines
+
+
+def _swapped_language_attributes(lines):
+    return _replace_first(lines, lambda line: "<xliff" in line,
+                          lambda line: re.sub(r'(srcLang="[^"]*") (trgLang="[^"]*")', r'\2 \1', line))
+
+
+def _mismatched_end_tag(lines):
+    return _replace_first(lines, lambda line: "</unit>" in line, lambda line: line.replace("</unit>", "</unitx>"))
+
+
+def _unknown_segment_attribute(lines):
+    return _replace_first(lines, lambda line: "<segment" in line, lambda line: line.replace("<segment", '<segment unknown="yes"', 1))
+
+
+def _duplicated_data_element(lines):
+    for i, line in enumerate(lines):
+        if "<data " in line:
+            return lines[:i + 1] + [line] + lines[i + 1:]
+    return None
+
+
+def _extra_java_placeholder(lines):
+    return _replace_first(lines, lambda line: "</target>" in line, lambda line: line.replace("</target>", " {9}</target>", 1))
+
+
+def _misindented_target(lines):
+    return _replace_first(lines, lambda line: "<target" in line, lambda line: " " + line)
+
+
+def _untranslated_target(lines):
+    for first, unit_lines in split_units(lines):
+        source, target = _block_lines(unit_lines, "source"), _block_lines(unit_lines, "target")
+        if source and target:
+            start = first + unit_lines.index(target[0])
+            copy = "".join(source).replace("<source", "<target", 1)
+            copy = copy[::-1].replace(">ecruos/<", ">tegrat/<", 1)[::-1]
+            return lines[:start] + copy.splitlines(keepends=True) + lines[start + len(target):]
+    return None
+
+
+def _initial_state_with_translated_target(lines):
+    return _replace_first(lines, lambda line: '<segment' in line and 'state="final"' in line,
+                          lambda line: line.replace('state="final"', 'state="initial"', 1))
+
+
+def _mismatched_placeholder_data(lines):
+    # Points an end tag's data at a different element, so the reconstructed markup no longer nests (<strong>...</p>)
+    for i, line in enumerate(lines):
+        match = re.search(r'(<data id="[^"]*_end">&lt;/)(\w+)(&gt;)', line)
+        if match:
+            other = "p" if match.group(2) != "p" else "span"
+            return lines[:i] + [line[:match.start(2)] + other + line[match.end(2):]] + lines[i + 1:]
+    return None
+
+
+def _misindented_unit(lines):
+    return _replace_first(lines, lambda line: "<unit" in line, lambda line: " " + line)
+
+
+def _missing_unit(lines):
+    units = split_units(lines)
+    if len(units) < 2:
+        return None
+    first, unit_lines = units[1]
+    return lines[:first] + lines[first + len(unit_lines):]
+
+
+def _changed_file_attribute(lines):
+    return _replace_first(lines, lambda line: "<file" in line and 'canResegment="no"' in line,
+                          lambda line: line.replace('canResegment="no"', 'canResegment="yes"', 1))
+
+
+def _structure_changes(lines):
+    # A missing unit or an extra <data> mustn't hide the differences after it, so the attribute is changed on the last
+    # <unit>; files without <originalData> just don't get the extra <data>
+    lines = _changed_file_attribute(_missing_unit(lines) or [])
+    if lines is None:
+        return None
+    lines = _duplicated_data_element(lines) or lines
+    for i in range(len(lines) - 1, -1, -1):
+        if "<unit" in lines[i] and 'canResegment="no"' in lines[i]:
+            return lines[:i] + [lines[i].replace('canResegment="no"', 'canResegment="yes"', 1)] + lines[i + 1:]
+    return None
+
+
+# How to break a translated file so that each check reports it: check name -> (description, corruption). A corruption
+# takes the file's lines and returns the broken lines, or None if the file has nothing it can break (e.g. no
+# <originalData>). Each corruption targets the first place in the file it applies to.
+CORRUPTIONS = {
+    "check_utf8_bom": ("UTF-8 BOM removed", _remove_bom),
+    "check_xml_declaration": ("XML declaration uses single quotes and lowercase utf-8", _single_quoted_declaration),
+    "check_namespace_prefixes": ("first <segment> written with an ns0: prefix", _prefixed_segment),
+    "check_xliff_element_attributes": ("srcLang and trgLang swapped on <xliff>", _swapped_language_attributes),
+    "check_xml_validation": ("first </unit> misspelled", _mismatched_end_tag),
+    "check_xliff_schema": ("unknown attribute on the first <segment>", _unknown_segment_attribute),
+    "check_duplicate_ids": ("first <data> element duplicated", _duplicated_data_element),
+    "check_java_placeholders": ("extra {9} in the first <target>", _extra_java_placeholder),
+    "check_target_format": ("first <target> indented one extra space", _misindented_target),
+    "check_untranslated_targets": ("first <target> replaced by a copy of its <source>", _untranslated_target),
+    "check_initial_segment_targets": ("first final segment marked initial, keeping its translated target", _initial_state_with_translated_target),
+    "check_xliff_placeholders": ("first end tag <data> closes a different element", _mismatched_placeholder_data),
+    "check_file_pair_formatting": ("first <unit> indented one extra space", _misindented_unit),
+    "check_file_pair_units": ("second unit removed", _missing_unit),
+    "check_file_pair_structure": ("second unit removed, first <data> element duplicated, canResegment changed on the "
+                                  "first <file> and the last <unit>", _structure_changes),
+}
+
+
+def write_corrupted_variants(master_filepath, translated_filepath, out_dir, checks=None):
+    """
+    Writes one broken copy of a file pair per check into out_dir/<check name>/: the master unchanged, and the translated
+    file broken by the check's entry in CORRUPTIONS. Keeping the original file names means the pair is still matched up
+    by name (see xliff_validation_runner.plan_validation_jobs()).
+
+    Returns a dict of check name -> (master_path, translated_path) for the variants written; checks whose corruption
+    doesn't apply to the file are left out.
+    """
+    lines = read_xliff_lines(translated_filepath)
+    variants = {}
+    for check_name in checks or CORRUPTIONS:
+        _, corrupt = CORRUPTIONS[check_name]
+        broken = corrupt(list(lines))
+        if broken is None:
+            continue
+        variant_dir = os.path.join(out_dir, check_name)
+        os.makedirs(variant_dir, exist_ok=True)
+        master_path = os.path.join(variant_dir, os.path.basename(master_filepath))
+        translated_path = os.path.join(variant_dir, os.path.basename(translated_filepath))
+        shutil.copyfile(master_filepath, master_path)
+        write_xliff_lines(translated_path, broken)
+        variants[check_name] = (master_path, translated_path)
+    return variants
+
+
+def scale_xliff_lines(lines, factor):
+    """
+    Returns the lines of an XLIFF file with the units of every <file> element repeated factor times.
+
+    The block of lines from the first <unit> to the last </unit> in each <file> is copied as is (so the formatting
+    the checks care about is unchanged), and the unit ids in copy n are suffixed with "-n" to keep them unique.
+    """
+    if factor <= 1:
+        return list(lines)
+
+    scaled = []
+    block = None
+    pending = []
+    for line in lines:
+        if block is None and "<unit" in line:
+            block = []
+        if block is None:
+            scaled.append(line)
+            continue
+        pending.append(line)
+        if "</unit>" in line:
+            block.extend(pending)
+            pending = []
+        elif "</file>" in line:
+            scaled.extend(block)
+            for copy in range(1, factor):
+                scaled.extend(UNIT_ID_PATTERN.sub(lambda m, n=copy: f"{m.group(1)}{m.group(2)}-{n}{m.group(3)}", text) for text in block)
+            scaled.extend(pending)
+            block = None
+            pending = []
+    if block is not None:
+        scaled.extend(block)
+        scaled.extend(pending)
+    return scaled
+
+
+def write_scaled_file(filepath, factor, out_dir):
+    """
+    Writes filepath scaled by factor (see scale_xliff_lines()) into out_dir under the same name and returns its path.
+    """
+    out_path = os.path.join(out_dir, os.path.basename(filepath))
+    write_xliff_lines(out_path, scale_xliff_lines(read_xliff_lines(filepath), factor))
+    return out_path
+
+
+def main():
+    """
+    User Entry Point
+
+    Writes a synthetic corpus, and optionally the corrupted variants of its first file pair, to a folder.
+    """
+    parser = argparse.ArgumentParser(description="Generate large synthetic XLIFF 2.0 files for benchmarks and stress tests.")
+    parser.add_argument("out_dir", help="Folder to write the files to.")
+    parser.add_argument("--master", default=None, help="Use the units of this master XLIFF file as templates (default: built-in templates).")
+    parser.add_argument("--files", type=int, default=1, help="Number of file sets (default: %(default)s).")
+    parser.add_argument("--units", type=int, default=1000, help="Units per file (default: %(default)s).")
+    parser.add_argument("--languages", default=",".join(DEFAULT_LANGUAGES), help="Comma separated target languages (default: %(default)s).")
+    parser.add_argument("--units-per-file-element", type=int, default=DEFAULT_UNITS_PER_FILE_ELEMENT, help="Units per <file> element (default: %(default)s).")
+    parser.add_argument("--stem", default=DEFAULT_STEM, help="File name stem (default: %(default)s).")
+    parser.add_argument("--corrupt", action="store_true", help="Also write one broken copy of the first file pair per check under out_dir/corrupt/.")
+    args = parser.parse_args()
+
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    file_sets = generate_corpus(args.out_dir, args.master, file_count=args.files, unit_count=args.units, languages=languages,
+                                units_per_file_element=args.units_per_file_element, stem=args.stem)
+    for master_path, translated_paths in file_sets:
+        print(f"Wrote {master_path} and {len(translated_paths)} translated file(s)")
+
+    if args.corrupt and file_sets and file_sets[0][1]:
+        master_path, translated_paths = file_sets[0]
+        variants = write_corrupted_variants(master_path, translated_paths[0], os.path.join(args.out_dir, "corrupt"))
+        for check_name, (_, translated_path) in variants.items():
+            print(f"Wrote {translated_path} ({CORRUPTIONS[check_name][0]})")
+
+if __name__ == "__main__":
+    main()
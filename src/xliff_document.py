@@ -0,0 +1,157 @@
+import hashlib
+import io
+import os
+
+from lxml import etree
+
+from xliff_unit_index import UnitIndex
+from xliff_line_signatures import LineSignatures
+
+XLIFF_NAMESPACES = {"ns": "urn:oasis:names:tc:xliff:document:2.0"}
+
+
+class XliffDocument:
+    """
+    A single XLIFF file loaded once and shared by every check in a validation run.
+
+    The raw bytes are read eagerly. The decoded lines, the lxml tree, the unit/segment lists and the
+    line-based UnitIndex and LineSignatures are built lazily on first use and then cached, so a file is decoded and parsed at most once no matter
+    how many checks look at it.
+
+    Attributes:
+        filepath (str): Full path to the file.
+        filename (str): Base name of the file, used in ValidationIssue reporting.
+        raw_bytes (bytes): The file contents exactly as stored on disk (including any BOM).
+    """
+
+    def __init__(self, filepath, raw_bytes):
+        self.filepath = filepath
+        self.filename = os.path.basename(filepath)
+        self.raw_bytes = raw_bytes
+        self._sha256 = None
+        self._lines = None
+        self._tree = None
+        self._parse_error = None
+        self._recovered_tree = None
+        self._recovered = False
+        self._units = None
+        self._segments = None
+        self._unit_index = None
+        self._line_signatures = None
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Reads the file at filepath and returns an XliffDocument for it.
+        """
+        with open(filepath, "rb") as f:
+            return cls(filepath, f.read())
+
+    @property
+    def sha256(self):
+        """
+        Hex SHA-256 digest of raw_bytes, identifying the exact file content (e.g. for result caching).
+        """
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.raw_bytes).hexdigest()
+        return self._sha256
+
+    @property
+    def lines(self):
+        """
+        The file decoded as UTF-8 (BOM stripped) and split into lines, identical to read_file_lines().
+
+        Raises:
+            UnicodeDecodeError: If the file is not UTF-8 encoded.
+        """
+        if self._lines is None:
+            with io.TextIOWrapper(io.BytesIO(self.raw_bytes), encoding="utf-8-sig") as f:
+                self._lines = f.readlines()
+        return self._lines
+
+    @property
+    def tree(self):
+        """
+        The root element of the file parsed strictly with lxml (sourceline is available on every element).
+
+        Raises:
+            etree.XMLSyntaxError: If the file is not well-formed XML. The error is cached and re-raised on each access.
+        """
+        if self._tree is None and self._parse_error is None:
+            try:
+                parser = etree.XMLParser(recover=False, resolve_entities=True, dtd_validation=False)
+                self._tree = etree.fromstring(self.raw_bytes, parser)
+            except etree.XMLSyntaxError as e:
+                self._parse_error = e
+        if self._parse_error is not None:
+            raise self._parse_error
+        return self._tree
+
+    @property
+    def recovered_tree(self):
+        """
+        The strict tree when the file is well-formed, otherwise a best-effort tree parsed with recover=True.
+        Used by checks that report what they can even when CHECK #5 would fail.
+        """
+        if not self._recovered:
+            try:
+                self._recovered_tree = self.tree
+            except etree.XMLSyntaxError:
+                self._recovered_tree = etree.fromstring(self.raw_bytes, etree.XMLParser(recover=True))
+            self._recovered = True
+        return self._recovered_tree
+
+    @property
+    def units(self):
+        """
+        All <unit> elements in document order.
+        """
+        if self._units is None:
+            tree = self.recovered_tree
+            self._units = tree.xpath("//ns:unit", namespaces=XLIFF_NAMESPACES) if tree is not None else []
+        return self._units
+
+    @property
+    def segments(self):
+        """
+        All <segment> elements in document order.
+        """
+        if self._segments is None:
+            tree = self.recovered_tree
+            self._segments = tree.xpath("//ns:segment", namespaces=XLIFF_NAMESPACES) if tree is not None else []
+        return self._segments
+
+    @property
+    def unit_index(self):
+        """
+        The UnitIndex of the decoded lines: where every unit, segment, <source> and <target> is, found in one scan.
+
+        Raises:
+            UnicodeDecodeError: If the file is not UTF-8 encoded.
+        """
+        if self._unit_index is None:
+            self._unit_index = UnitIndex.build(self.lines)
+        return self._unit_index
+
+    @property
+    def line_signatures(self):
+        """
+        The LineSignatures (leading/trailing whitespace and first tag of each line) of the decoded lines, computed once
+        for all formatting comparisons.
+
+        Raises:
+            UnicodeDecodeError: If the file is not UTF-8 encoded.
+        """
+        if self._line_signatures is None:
+            self._line_signatures = LineSignatures.build(self.lines)
+        return self._line_signatures
+
+    @property
+    def source_language(self):
+        tree = self.recovered_tree
+        return tree.get("srcLang") if tree is not None else None
+
+    @property
+    def target_language(self):
+        tree = self.recovered_tree
+        return tree.get("trgLang") if tree is not None else None
@@ -0,0 +1,144 @@
+"""
+Per-Line Format Signatures
+
+The formatting checks compare files line by line: the leading whitespace, the trailing whitespace and the first tag of
+each line must match between a <source> and its <target> (CHECK #9), and between a master and its translated file
+(check_line_structure_match, CHECK #13). Running regexes over every line of every block for every comparison is slow on
+multi-MB files, so LineSignatures computes each line's signature once per file and stores it as integer arrays:
+- leading: the leading whitespace (as a token id, so tabs vs. spaces still count), and indent, its length
+- trailing: the trailing whitespace (token id), including the newline
+- tag: the first tag on the line such as "<source" or "</pc" (token id), or NO_TAG
+
+Token ids are shared by every LineSignatures in the process, so signatures of different files can be compared directly,
+and comparing two blocks becomes a comparison of array slices that only falls back to a per-line loop to report the
+lines that differ.
+"""
+
+import re
+from array import array
+
+NO_TAG = 0
+
+TAG_PATTERN = re.compile(r"<\/?\w+")
+
+# Token table shared by all signatures: id -> text and text -> id. Id 0 is NO_TAG.
+_tokens = [None]
+_token_ids = {}
+
+
+def token_id(text):
+    """
+    Returns the id of text in the shared token table, adding it if needed.
+    """
+    tid = _token_ids.get(text)
+    if tid is None:
+        tid = _token_ids[text] = len(_tokens)
+        _tokens.append(text)
+    return tid
+
+
+def token_text(tid):
+    """
+    Returns the text of a token id (None for NO_TAG).
+    """
+    return _tokens[tid]
+
+
+SOURCE_OPEN = token_id("<source")
+SOURCE_CLOSE = token_id("</source")
+TARGET_OPEN = token_id("<target")
+TARGET_CLOSE = token_id("</target")
+
+WHITESPACE_MISMATCH = "whitespace"
+TAG_MISMATCH = "tag"
+
+
+class LineSignatures:
+    """
+    The format signature of every line of a file (or block), as parallel arrays indexed by 0-based line number.
+    """
+
+    def __init__(self):
+        self.leading = array("l")
+        self.indent = array("l")
+        self.trailing = array("l")
+        self.tag = array("l")
+
+    @classmethod
+    def build(cls, lines):
+        """
+        Computes the signatures of lines in one pass.
+        """
+        signatures = cls()
+        leading, indent, trailing, tag = signatures.leading, signatures.indent, signatures.trailing, signatures.tag
+        ids = _token_ids
+        for line in lines:
+            lstripped = line.lstrip()
+            rstripped = line.rstrip()
+            lead_length = len(line) - len(lstripped)
+            lead = line[:lead_length]
+            trail = line[len(rstripped):]
+            lead_id = ids.get(lead)
+            trail_id = ids.get(trail)
+            leading.append(lead_id if lead_id is not None else token_id(lead))
+            indent.append(lead_length)
+            trailing.append(trail_id if trail_id is not None else token_id(trail))
+            if lstripped.startswith("<"):
+                match = TAG_PATTERN.match(lstripped)
+                tag.append(token_id(match.group()) if match else NO_TAG)
+            else:
+                tag.append(NO_TAG)
+        return signatures
+
+    def __len__(self):
+        return len(self.tag)
+
+
+def _tags_match(source_tag, target_tag):
+    # Lines without a tag aren't compared; <source>/<target> and </source>/</target> are equivalent
+    return (source_tag == target_tag or source_tag == NO_TAG or target_tag == NO_TAG
+            or (source_tag == SOURCE_OPEN and target_tag == TARGET_OPEN)
+            or (source_tag == SOURCE_CLOSE and target_tag == TARGET_CLOSE))
+
+
+def find_format_mismatches(source, source_start, target, target_start, count):
+    """
+    Compares count lines of source (from line source_start) with the same number of lines of target (from target_start),
+    the way compare_format_lines() does: whitespace first, then the first tag.
+
+    Returns a list of (offset, kind) for every line that differs, where offset is 0-based from the start of the blocks
+    and kind is WHITESPACE_MISMATCH or TAG_MISMATCH. Blocks that match are detected with array slice comparisons,
+    without a per-line loop.
+    """
+    source_end = source_start + count
+    target_end = target_start + count
+    whitespace_equal = (source.leading[source_start:source_end] == target.leading[target_start:target_end]
+                        and source.trailing[source_start:source_end] == target.trailing[target_start:target_end])
+    if whitespace_equal:
+        source_tags = source.tag[source_start:source_end]
+        target_tags = target.tag[target_start:target_end]
+        if source_tags == target_tags:
+            return []
+        # The usual difference between a <source> and its <target> block is only the <source>/<target> tags themselves
+        if all(_tags_match(s, t) for s, t in zip(source_tags, target_tags)):
+            return []
+
+    mismatches = []
+    for j in range(count):
+        s, t = source_start + j, target_start + j
+        if source.leading[s] != target.leading[t] or source.trailing[s] != target.trailing[t]:
+            mismatches.append((j, WHITESPACE_MISMATCH))
+        elif not _tags_match(source.tag[s], target.tag[t]):
+            mismatches.append((j, TAG_MISMATCH))
+    return mismatches
+
+
+def find_structure_mismatches(first, second):
+    """
+    Compares two files line by line on indentation (leading whitespace length) and first tag, over the lines they both
+    have. Returns the 0-based numbers of the lines that differ.
+    """
+    count = min(len(first), len(second))
+    if first.indent[:count] == second.indent[:count] and first.tag[:count] == second.tag[:count]:
+        return []
+    return [i for i in range(count) if first.indent[i] != second.indent[i] or first.tag[i] != second.tag[i]]
@@ -0,0 +1,334 @@
+"""
+Persistent Byte-Offset Index of the Units in an XLIFF File
+
+Every tool that needs one unit of a large master (extracting a unit for review, looking up its source) reads and scans
+the whole file to find it. OffsetIndex records where each unit is once, as byte offsets, line numbers, unit ids and a
+SHA-256 of each unit's bytes, and saves it in a sidecar file next to the XLIFF file (klms8-messages(en).xlf.idx). The
+sidecar also records the size and mtime of the XLIFF file, so it is rebuilt as soon as the file changes.
+
+MappedXliff opens the XLIFF file with mmap and uses the index to slice a unit straight out of the mapping: once the
+sidecar exists, getting a unit costs a dictionary lookup and a copy of the unit's bytes, however big the file is.
+
+The index is built with UnitIndex from the lines as written (nothing is parsed), and like ValidationCache entries the
+sidecar is a small JSON file written atomically, so several processes can share it.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+from array import array
+from itertools import accumulate
+
+from utils import configure_logging
+from utils import logger
+from xliff_unit_index import UnitIndex, NO_LINE
+
+INDEX_VERSION = 1
+SIDECAR_SUFFIX = ".idx"
+BOM = b'\xef\xbb\xbf'
+
+
+def sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+class OffsetIndex:
+    """
+    Where each unit of an XLIFF file is, by byte offset.
+
+    Attributes:
+        size, mtime_ns (int): Size and modification time of the XLIFF file the index was built from.
+        header_end (int): Byte offset of the first <file> line (everything before it is the header), or the file size.
+        trailer_start (int): Byte offset just after the last </file> line, or the file size.
+        file_ids (list[str]): The id of each <file> element (None if it has none), in file order.
+        file_open, file_close (list[[start, end]]): Byte range of each <file> line and </file> line (None if missing).
+        unit_ids (list[str]): The id of each closed unit (None if it has none), in file order.
+        unit_file (list[int]): The <file> element each unit is in, as an index into file_ids (NO_LINE if none).
+        unit_byte_start, unit_byte_end (list[int]): Byte range of each unit, from the start of its <unit> line to the
+            end of its </unit> line (end exclusive).
+        unit_line_start, unit_line_end (list[int]): 1-based line numbers of each unit's <unit> and </unit>.
+        unit_hash (list[str]): SHA-256 (hex) of each unit's bytes.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.mtime_ns = 0
+        self.header_end = 0
+        self.trailer_start = 0
+        self.file_ids = []
+        self.file_open = []
+        self.file_close = []
+        self.unit_ids = []
+        self.unit_file = []
+        self.unit_byte_start = []
+        self.unit_byte_end = []
+        self.unit_line_start = []
+        self.unit_line_end = []
+        self.unit_hash = []
+        self._unit_positions = None
+
+    @classmethod
+    def build(cls, data, size=None, mtime_ns=0):
+        """
+        Scans data (the bytes of an XLIFF file) once and returns its OffsetIndex. Unclosed units are left out.
+        """
+        # bytes.splitlines() only splits on \n, \r and \r\n, so the lines add up to the bytes exactly
+        raw_lines = data.splitlines(keepends=True)
+        offsets = array("q", accumulate(map(len, raw_lines), initial=0))
+        index = UnitIndex.build([line.decode("utf-8", errors="replace") for line in raw_lines])
+
+        def line_range(line):
+            return [offsets[line], offsets[line + 1]] if line != NO_LINE else None
+
+        offset_index = cls()
+        offset_index.size = len(data) if size is None else size
+        offset_index.mtime_ns = mtime_ns
+        offset_index.header_end = offsets[index.file_start[0]] if index.file_start else len(data)
+        last_file_end = max(index.file_end, default=NO_LINE)
+        offset_index.trailer_start = offsets[last_file_end + 1] if last_file_end != NO_LINE else len(data)
+        offset_index.file_ids = list(index.file_ids)
+        offset_index.file_open = [line_range(line) for line in index.file_start]
+        offset_index.file_close = [line_range(line) for line in index.file_end]
+        for unit, unit_id in enumerate(index.unit_ids):
+            start, end = index.unit_start[unit], index.unit_end[unit]
+            if end == NO_LINE:
+                continue
+            byte_start, byte_end = offsets[start], offsets[end + 1]
+            offset_index.unit_ids.append(unit_id)
+            offset_index.unit_file.append(index.unit_file[unit])
+            offset_index.unit_byte_start.append(byte_start)
+            offset_index.unit_byte_end.append(byte_end)
+            offset_index.unit_line_start.append(start + 1)
+            offset_index.unit_line_end.append(end + 1)
+            offset_index.unit_hash.append(hashlib.sha256(data[byte_start:byte_end]).hexdigest())
+        return offset_index
+
+    @classmethod
+    def from_file(cls, path):
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            return cls.build(f.read(), stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the index in the sidecar of the XLIFF file at path, or None if there is no readable sidecar or it was
+        built from a different version of the file (size or mtime changed).
+        """
+        try:
+            stat = os.stat(path)
+            with open(sidecar_path(path), encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return None
+            offset_index = cls.from_dict(data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        return offset_index if offset_index.is_current(stat) else None
+
+    @classmethod
+    def for_file(cls, path, write=True):
+        """
+        Returns the index of the XLIFF file at path: the one in its sidecar if it is current, otherwise a new one (saved
+        to the sidecar unless write is False).
+        """
+        offset_index = cls.load(path)
+        if offset_index is None:
+            logger.info("Indexing %s", path)
+            offset_index = cls.from_file(path)
+            if write:
+                try:
+                    offset_index.save(path)
+                except OSError as e:
+                    logger.warning("Could not write the index of %s: %s", path, e)
+        return offset_index
+
+    def is_current(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def save(self, path):
+        """
+        Writes the index to the sidecar of the XLIFF file at path (atomically).
+        """
+        target = sidecar_path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "header_end": self.header_end,
+            "trailer_start": self.trailer_start,
+            "file_ids": self.file_ids,
+            "file_open": self.file_open,
+            "file_close": self.file_close,
+            "unit_ids": self.unit_ids,
+            "unit_file": self.unit_file,
+            "unit_byte_start": self.unit_byte_start,
+            "unit_byte_end": self.unit_byte_end,
+            "unit_line_start": self.unit_line_start,
+            "unit_line_end": self.unit_line_end,
+            "unit_hash": self.unit_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        offset_index = cls()
+        for name, value in data.items():
+            if name != "version":
+                setattr(offset_index, name, value)
+        if len({len(offset_index.unit_ids), len(offset_index.unit_byte_start), len(offset_index.unit_byte_end), len(offset_index.unit_hash)}) != 1:
+            raise ValueError("Inconsistent unit columns")
+        return offset_index
+
+    @property
+    def unit_count(self):
+        return len(self.unit_ids)
+
+    def find_unit(self, unit_id):
+        """
+        Returns the index of the first unit with id unit_id, or None.
+        """
+        if self._unit_positions is None:
+            self._unit_positions = {}
+            for unit, uid in enumerate(self.unit_ids):
+                self._unit_positions.setdefault(uid, unit)
+        return self._unit_positions.get(unit_id)
+
+
+class MappedXliff:
+    """
+    An XLIFF file opened with mmap, with its OffsetIndex (from the sidecar, built and saved if missing or stale). Use as
+    a context manager, or call close().
+    """
+
+    def __init__(self, path, write_index=True):
+        self.path = path
+        self.index = OffsetIndex.for_file(path, write=write_index)
+        self._file = open(path, "rb")
+        try:
+            # mmap can't map an empty file
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.index.size else b""
+        except BaseException:
+            self._file.close()
+            raise
+        if len(self.data) != self.index.size:
+            self.close()
+            raise OSError(f"{path} changed while it was being opened")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def unit_bytes(self, unit_id, verify=False):
+        """
+        Returns the bytes of the unit, from <unit> to </unit> (line endings included), or None if there is no such unit.
+        With verify, raises ValueError if they don't match the hash in the index.
+        """
+        unit = self.index.find_unit(unit_id)
+        if unit is None:
+            return None
+        data = self.data[self.index.unit_byte_start[unit]:self.index.unit_byte_end[unit]]
+        if verify and hashlib.sha256(data).hexdigest() != self.index.unit_hash[unit]:
+            raise ValueError(f"Unit '{unit_id}' in {self.path} doesn't match its index")
+        return data
+
+    def unit_lines(self, unit_id):
+        """
+        Returns the lines of the unit, as in the file (line endings included), or [] if there is no such unit.
+        """
+        data = self.unit_bytes(unit_id)
+        return data.decode("utf-8").splitlines(keepends=True) if data is not None else []
+
+    def unit_line_number(self, unit_id):
+        """
+        Returns the 1-based line number of the unit's <unit> line, or None.
+        """
+        unit = self.index.find_unit(unit_id)
+        return self.index.unit_line_start[unit] if unit is not None else None
+
+    def extract(self, unit_ids):
+        """
+        Returns the bytes of a mini XLIFF file holding the units with unit_ids (in file order), laid out like
+        UnitExtractor.extract() (see xliff_translator): the file's header, each unit inside its <file> and </file>
+        lines, and the file's trailer. The BOM, if any, is part of the header.
+        """
+        index = self.index
+        units = sorted({unit for unit in map(index.find_unit, unit_ids) if unit is not None})
+        parts = [self.data[:index.header_end]]
+        file = None
+
+        def add_range(byte_range):
+            if byte_range is not None:
+                parts.append(self.data[byte_range[0]:byte_range[1]])
+
+        for unit in units:
+            if index.unit_file[unit] != file:
+                if file is not None and file != NO_LINE:
+                    add_range(index.file_close[file])
+                file = index.unit_file[unit]
+                if file != NO_LINE:
+                    add_range(index.file_open[file])
+            parts.append(self.data[index.unit_byte_start[unit]:index.unit_byte_end[unit]])
+        if file is not None and file != NO_LINE:
+            add_range(index.file_close[file])
+        parts.append(self.data[index.trailer_start:])
+        return b"".join(parts)
+
+    def write_units(self, output_path, unit_ids):
+        with open(output_path, "wb") as f:
+            f.write(self.extract(unit_ids))
+
+
+def main():
+    """
+    User Entry Point
+
+    Builds (or refreshes) the sidecar index of each XLIFF file, and prints or extracts units through it.
+    """
+    parser = argparse.ArgumentParser(description="Build the byte-offset sidecar index of XLIFF files and read units through it.")
+    parser.add_argument("files", nargs="+", help="XLIFF files to index.")
+    parser.add_argument("--unit", action="append", default=[], metavar="ID", help="Print this unit (repeatable).")
+    parser.add_argument("--extract", metavar="OUTPUT", default=None, help="Write the --unit units of the (single) file to a mini XLIFF file.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress on stderr.")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    if args.extract and len(args.files) != 1:
+        parser.error("--extract needs exactly one file")
+
+    for path in args.files:
+        with MappedXliff(path) as xliff:
+            print(f"{path}: {xliff.index.unit_count} unit(s) indexed in {sidecar_path(path)}")
+            for unit_id in args.unit:
+                data = xliff.unit_bytes(unit_id, verify=True)
+                if data is None:
+                    print(f"  {unit_id}: not found")
+                else:
+                    print(f"  {unit_id} (line {xliff.unit_line_number(unit_id)}):")
+                    print(data.decode("utf-8"), end="")
+            if args.extract:
+                xliff.write_units(args.extract, args.unit)
+                print(f"Wrote {args.extract}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Incremental Retranslation
+
+When the English master changes, only the units whose source changed need translating again. This module diffs the old
+and new master by unit id and a hash of each unit's source content, works out for each language file which units are
+stale, and patches the language files from line spans: units that didn't change are copied from the language file as
+they are, and only the added and changed units are taken from the new master (with their translation, if there is
+one). The work is proportional to the change, not to the size of the file.
+
+A unit's source hash covers the content of its <source> elements and its <originalData> lines (changed placeholders
+need a new target too), exactly as written. Units are read with UnitIndex; nothing is parsed.
+"""
+
+import argparse
+import hashlib
+import os
+from dataclasses import dataclass, field
+
+from utils import configure_logging
+from utils import logger
+from xliff_unit_index import UnitIndex, NO_LINE, element_content
+from xliff_translator import XliffTemplate, TRG_LANG_PATTERN
+from translation_memory import file_languages
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return f.readlines()
+
+
+def write_lines(path, lines):
+    with open(path, "wb") as f:
+        f.write(b'\xef\xbb\xbf')
+        f.write("".join(lines).encode("utf-8"))
+
+
+def unit_source_hashes(lines, index=None):
+    """
+    Returns {unit_id: source hash} for the units of lines (the first unit, for an id used more than once).
+    """
+    index = index or UnitIndex.build(lines)
+    hashes = {}
+    for unit, unit_id in enumerate(index.unit_ids):
+        if unit_id in hashes:
+            continue
+        digest = hashlib.sha256()
+        start, end = index.original_data_start[unit], index.original_data_end[unit]
+        if start != NO_LINE and end != NO_LINE:
+            digest.update("".join(lines[start:end + 1]).encode("utf-8"))
+        for segment in index.unit_segments(unit):
+            source = element_content(lines, index.source_start[segment], index.source_end[segment], "source")
+            digest.update(b"\0" + (source or "").encode("utf-8"))
+        hashes[unit_id] = digest.hexdigest()
+    return hashes
+
+
+@dataclass
+class MasterDiff:
+    """
+    How the units of the new master differ from the old one. Each list holds unit ids in new master order (removed in old
+    master order).
+    """
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+
+
+def diff_masters(old_lines, new_lines):
+    """
+    Compares two versions of the English master by unit id and source hash. Returns (MasterDiff, new master source hashes).
+    """
+    old_hashes = unit_source_hashes(old_lines)
+    new_hashes = unit_source_hashes(new_lines)
+    diff = MasterDiff()
+    for unit_id, new_hash in new_hashes.items():
+        old_hash = old_hashes.get(unit_id)
+        if old_hash is None:
+            diff.added.append(unit_id)
+        elif old_hash != new_hash:
+            diff.changed.append(unit_id)
+        else:
+            diff.unchanged.append(unit_id)
+    diff.removed = [unit_id for unit_id in old_hashes if unit_id not in new_hashes]
+    return diff, new_hashes
+
+
+@dataclass
+class RetranslationPlan:
+    """
+    The work for one language file: the units to translate (added, changed in the master, or whose source in the
+    language file doesn't match the new master), and the units to drop because they are no longer in the master.
+    """
+    path: str
+    language: str
+    to_translate: list = field(default_factory=list)
+    to_remove: list = field(default_factory=list)
+    kept: int = 0
+
+
+def plan_retranslation(old_master_path, new_master_path, language_paths):
+    """
+    Diffs the masters and returns (MasterDiff, [RetranslationPlan per language file]).
+    """
+    new_lines = read_lines(new_master_path)
+    diff, new_hashes = diff_masters(read_lines(old_master_path), new_lines)
+    master_stale = set(diff.added) | set(diff.changed)
+
+    plans = []
+    for path in language_paths:
+        lines = read_lines(path)
+        index = UnitIndex.build(lines)
+        language_hashes = unit_source_hashes(lines, index)
+        plan = RetranslationPlan(path, file_languages(lines)[1])
+        for unit_id, new_hash in new_hashes.items():
+            if unit_id in master_stale or language_hashes.get(unit_id) != new_hash:
+                plan.to_translate.append(unit_id)
+            else:
+                plan.kept += 1
+        plan.to_remove = [unit_id for unit_id in language_hashes if unit_id not in new_hashes]
+        plans.append(plan)
+    return diff, plans
+
+
+def patch_language_lines(new_master_lines, language_lines, language, stale_unit_ids, translations):
+    """
+    Returns the lines of the language file updated to the new master.
+
+    Everything outside the units comes from the new master (with the language's trgLang). Each unit that isn't stale
+    is copied from the language file's line span. Each stale unit is taken from the new master: with its translated
+    <target> block from translations ({unit_id: lines}) and state "translated" if there is one, otherwise with the
+    master's target and state "initial" (see XliffTemplate.render()). Units no longer in the master are dropped.
+    """
+    master_index = UnitIndex.build(new_master_lines)
+    language_index = UnitIndex.build(language_lines)
+    stale = set(stale_unit_ids)
+
+    patched = []
+    position = 0
+    for unit, unit_id in enumerate(master_index.unit_ids):
+        start, end = master_index.unit_start[unit], master_index.unit_end[unit]
+        if end == NO_LINE:
+            continue  # An unclosed unit is copied as part of the lines around it
+        patched.extend(_with_language(new_master_lines[position:start], language))
+        language_unit = language_index.find_unit(unit_id)
+        if unit_id not in stale and language_unit is not None and language_index.unit_end[language_unit] != NO_LINE:
+            patched.extend(language_index.unit_lines(language_lines, language_unit))
+        else:
+            unit_lines = new_master_lines[start:end + 1]
+            patched.extend(XliffTemplate.build(unit_lines).render(language, translations))
+        position = end + 1
+    patched.extend(_with_language(new_master_lines[position:], language))
+    return patched
+
+
+def apply_plan(plan, new_master_path, translations=None):
+    """
+    Patches the plan's language file in place (see patch_language_lines()). Returns True if the file changed; a file
+    with nothing to translate or remove is left alone.
+    """
+    if not plan.to_translate and not plan.to_remove:
+        return False
+    lines = read_lines(plan.path)
+    patched = patch_language_lines(read_lines(new_master_path), lines, plan.language, plan.to_translate, translations or {})
+    if patched == lines:
+        return False
+    write_lines(plan.path, patched)
+    return True
+
+
+def _with_language(lines, language):
+    return [TRG_LANG_PATTERN.sub(f'trgLang="{language}"', line, count=1) if "<xliff" in line else line for line in lines]
+
+
+def _memory_translations(memory, new_master_lines, language, unit_ids):
+    # Exact translation memory matches for the stale units of a language, as {unit_id: target block lines}
+    index = UnitIndex.build(new_master_lines)
+    translations = {}
+    for unit_id in unit_ids:
+        unit = index.find_unit(unit_id)
+        segments = index.unit_segments(unit) if unit is not None else ()
+        if len(segments) != 1:
+            continue
+        segment = segments[0]
+        source = element_content(new_master_lines, index.source_start[segment], index.source_end[segment], "source")
+        target_block = memory.lookup(source, language) if source is not None else None
+        if target_block is not None:
+            translations[unit_id] = target_block.splitlines(keepends=True)
+    return translations
+
+
+def main():
+    """
+    User Entry Point
+
+    Prints which units of each language file need translating after the master changed, and with --apply patches the
+    language files in place, filling in translations from a translation memory when one is given.
+    """
+    parser = argparse.ArgumentParser(description="Plan (and apply) the retranslation needed after the English master changed.")
+    parser.add_argument("old_master", help="The previous version of the English master.")
+    parser.add_argument("new_master", help="The new version of the English master.")
+    parser.add_argument("language_files", nargs="+", help="Language files translated from the previous master.")
+    parser.add_argument("--apply", action="store_true", help="Patch the language files in place.")
+    parser.add_argument("--memory", metavar="DB", default=None, help="Translation memory to take translations of the stale units from (see translation_memory).")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress on stderr.")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    diff, plans = plan_retranslation(args.old_master, args.new_master, args.language_files)
+    print(f"Master: {len(diff.added)} added, {len(diff.changed)} changed, {len(diff.removed)} removed, {len(diff.unchanged)} unchanged unit(s)")
+
+    memory = None
+    if args.memory:
+        from translation_memory import TranslationMemory
+        memory = TranslationMemory(args.memory)
+    try:
+        new_master_lines = read_lines(args.new_master) if memory else None
+        for plan in plans:
+            print(f"{os.path.basename(plan.path)} ({plan.language}): {len(plan.to_translate)} to translate, {len(plan.to_remove)} to remove, {plan.kept} kept")
+            for unit_id in plan.to_translate:
+                print(f"  translate: {unit_id}")
+            for unit_id in plan.to_remove:
+                print(f"  remove: {unit_id}")
+            if args.apply:
+                translations = _memory_translations(memory, new_master_lines, plan.language, plan.to_translate) if memory else {}
+                changed = apply_plan(plan, args.new_master, translations)
+                logger.info("%s %s (%d translation(s) from memory)", "Patched" if changed else "No changes to", plan.path, len(translations))
+                print(f"  {'patched' if changed else 'unchanged'}, {len(translations)} translation(s) from memory")
+    finally:
+        if memory:
+            memory.close()
+
+
+if __name__ == "__main__":
+    main()
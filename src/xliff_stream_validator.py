@@ -0,0 +1,204 @@
+"""
+Streaming XLIFF 2.0 Validation
+
+validate_xliff_file() loads the whole file, and the checks build full DOMs over it, so memory grows with the file size.
+For very large exports (Storyline files can be tens of MB) this module validates a file in a single streaming pass
+using lxml.etree.iterparse. Each <unit> is checked as soon as it has been parsed and is then cleared, so peak memory
+is bounded by the largest unit rather than the whole file.
+
+Only the checks that look at one unit at a time run in this mode:
+- CHECK #1 UTF-8 BOM (on the raw file, before streaming)
+- CHECK #5 XML Validation (a parse error stops the stream and is reported)
+- CHECK #7 Duplicate IDs, CHECK #8 Java Placeholders, CHECK #9 Target Format, CHECK #10 Untranslated Targets,
+  CHECK #11 Initial State, CHECK #12 XLIFF Placeholders (per unit)
+
+Checks that need the whole document (e.g. CHECK #6 XLIFF Schema) and the file pair checks don't run here; use
+validate_xliff_file() / validate_xliff_file_pair() for the full pipeline.
+"""
+
+import codecs
+import os
+
+from lxml import etree
+
+from utils import ValidationIssue
+from utils import ValidationReport
+from utils import logger
+from checks import check_utf8_bom, check_xml_validation, check_duplicate_ids, check_java_placeholders, check_target_format, check_untranslated_targets, check_initial_segment_targets, check_xliff_placeholders
+from checks.check_duplicate_ids import duplicate_id_issues_for_unit
+from checks.check_java_placeholders import java_placeholder_issues_for_segment
+from checks.check_target_format import target_format_issues_for_lines
+from checks.check_untranslated_targets import untranslated_target_issues_for_segment
+from checks.check_initial_segment_targets import initial_segment_issues_for_lines
+from checks.check_xliff_placeholders import FragmentBatch, placeholder_issues_for_unit
+from xliff_unit_index import UnitIndex
+
+XLIFF_NS = "urn:oasis:names:tc:xliff:document:2.0"
+XLIFF_TAG = f"{{{XLIFF_NS}}}xliff"
+UNIT_TAG = f"{{{XLIFF_NS}}}unit"
+SEGMENT_TAG = f"{{{XLIFF_NS}}}segment"
+# How many <data> values and reconstructed fragments CHECK #12 remembers between units (see FragmentBatch)
+MAX_CACHED_FRAGMENTS = 1000
+
+STREAMING_CHECKS = [check_utf8_bom, check_xml_validation, check_duplicate_ids, check_java_placeholders, check_target_format, check_untranslated_targets, check_initial_segment_targets, check_xliff_placeholders]
+
+
+class LineTrackingReader:
+    """
+    A file-like reader handed to iterparse that also remembers the decoded lines it has read, so per-unit checks can
+    look at the lines of the unit being processed. Lines are discarded once the units that use them are done, which
+    keeps only a window of the file (the current unit plus iterparse's read-ahead) in memory.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._lines = []
+        self._first_line_number = 1
+        self._partial = b""
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        chunk = self._partial + data
+        parts = chunk.split(b"\n")
+        self._partial = parts.pop()
+        if not data and self._partial:
+            parts.append(self._partial)
+            self._partial = b""
+        for part in parts:
+            self._append(part, "\n")
+        return data
+
+    def _append(self, part, newline):
+        if not self._lines and self._first_line_number == 1 and part.startswith(codecs.BOM_UTF8):
+            part = part[len(codecs.BOM_UTF8):]
+        if part.endswith(b"\r"):
+            part = part[:-1]
+        self._lines.append(part.decode("utf-8", errors="replace") + newline)
+
+    @property
+    def _next_line_number(self):
+        return self._first_line_number + len(self._lines)
+
+    def line(self, line_number):
+        """
+        Returns line line_number (1-based, including its newline), or None if it was discarded or hasn't been read yet.
+        """
+        if self._first_line_number <= line_number < self._next_line_number:
+            return self._lines[line_number - self._first_line_number]
+        if line_number == self._next_line_number and self._partial:
+            return self._partial.decode("utf-8", errors="replace")
+        return None
+
+    def discard_before(self, line_number):
+        """
+        Forgets every line before line_number.
+        """
+        count = min(line_number - self._first_line_number, len(self._lines))
+        if count > 0:
+            del self._lines[:count]
+            self._first_line_number += count
+
+
+def validate_xliff_file_streaming(filepath):
+    """
+    Validates filepath in one streaming pass with the per-unit checks (see the module docstring). Every streaming check
+    runs to completion, as in collect-all mode.
+
+    Returns a list of ValidationIssue objects, or an empty list if no validation issues were found.
+    """
+    return validate_xliff_file_streaming_report(filepath).issues
+
+
+def validate_xliff_file_streaming_report(filepath, on_issues=None):
+    """
+    Same as validate_xliff_file_streaming(), but returns a ValidationReport with the issues grouped by check. on_issues
+    is passed on to the ValidationReport, to receive the issues of each unit as soon as it has been checked.
+    """
+    logger.info("Validating XLIFF file (streaming): %s", filepath)
+    filename = os.path.basename(filepath)
+
+    report = ValidationReport(on_issues=on_issues)
+    for check in STREAMING_CHECKS:
+        report.add(check.__name__, [])
+
+    bom_issues = check_utf8_bom(filepath)
+    report.add(check_utf8_bom.__name__, bom_issues)
+
+    with open(filepath, "rb") as f:
+        reader = LineTrackingReader(f)
+        try:
+            _stream_units(filename, reader, report)
+        except etree.XMLSyntaxError as e:
+            line, column = e.position if hasattr(e, "position") else (1, 1)
+            line_text = reader.line(line)
+            report.add(check_xml_validation.__name__, [ValidationIssue(
+                validator="XML Validation",
+                message=f"XML parsing failed: {e.args[0]}",
+                filename=filename,
+                line=line,
+                column_start=column,
+                column_end=column + 1,
+                unit_id=None,
+                text=line_text.strip() if line_text is not None else "(line unavailable)"
+            )])
+
+    return report
+
+
+def _stream_units(filename, reader, report):
+    """
+    Runs the per-unit checks on each <unit> as iterparse completes it, then frees the unit and the lines before it.
+    """
+    translated = False
+    batch = FragmentBatch(max_cached=MAX_CACHED_FRAGMENTS)  # Keeps recent <data> classifications across units
+
+    def get_line_text(line):
+        text = reader.line(line) if line else None
+        return text.strip() if text is not None else "(unknown)"
+
+    context = etree.iterparse(reader, events=("start", "end"), tag=(XLIFF_TAG, UNIT_TAG), recover=False, resolve_entities=True)
+    for event, element in context:
+        if element.tag == XLIFF_TAG:
+            if event == "start":
+                src_lang, trg_lang = element.get("srcLang"), element.get("trgLang")
+                translated = bool(src_lang and trg_lang and src_lang != trg_lang)
+            continue
+        if event != "end":
+            continue
+
+        unit = element
+        report.add(check_duplicate_ids.__name__, duplicate_id_issues_for_unit(filename, unit))
+        for segment in unit.iter(SEGMENT_TAG):
+            report.add(check_java_placeholders.__name__, java_placeholder_issues_for_segment(filename, segment, get_line_text))
+            if translated:
+                report.add(check_untranslated_targets.__name__, untranslated_target_issues_for_segment(filename, segment))
+
+        first_line, last_line = unit.sourceline, _find_unit_end_line(reader, unit.sourceline)
+        unit_lines = [reader.line(n) for n in range(first_line, last_line + 1)]
+        unit_index = UnitIndex.build(unit_lines)
+        report.add(check_target_format.__name__, target_format_issues_for_lines(filename, unit_lines, first_line, index=unit_index))
+        report.add(check_initial_segment_targets.__name__, initial_segment_issues_for_lines(filename, unit_lines, first_line, index=unit_index))
+
+        placeholder_issues = placeholder_issues_for_unit(filename, unit, get_line_text, batch)
+        placeholder_issues.extend(batch.validate(filename, get_line_text))
+        placeholder_issues.sort(key=lambda issue: issue.line or 0)
+        report.add(check_xliff_placeholders.__name__, placeholder_issues)
+
+        # Free the processed unit, any earlier siblings still referenced by the parent, and the lines before this unit ends
+        unit.clear()
+        parent = unit.getparent()
+        while unit.getprevious() is not None:
+            del parent[0]
+        reader.discard_before(last_line)
+
+
+def _find_unit_end_line(reader, first_line):
+    """
+    Returns the number of the line holding the </unit> that closes the unit starting at first_line.
+    """
+    line_number = first_line
+    while True:
+        line = reader.line(line_number)
+        if line is None or "</unit>" in line:
+            return line_number if line is not None else line_number - 1
+        line_number += 1
@@ -126,7 +126,14 @@ Supported Languages:
 
 """
 
+import fnmatch
+import io
+import os
 import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from xliff_unit_index import UnitIndex, NO_LINE
+from xliff_line_signatures import LineSignatures, find_structure_mismatches, token_text
 
 # === Java Placeholder Protection ===
 
@@ -199,74 +206,192 @@ def translate_calendar_unit(unit_id, lang_code):
 def check_line_structure_match(path1, path2):
     """
     Precheck Line Structure Match ===
+
+    Compares the indentation and first tag of every line of the two files, using one LineSignatures per file, and returns
+    (line_number, (indent, tag), (indent, tag)) for every line that differs.
     """
     def analyze(file_path):
-        structure = []
         with open(file_path, "r", encoding="utf-8-sig") as f:
-            for line in f:
-                leading_ws = len(line) - len(line.lstrip())
-                tag_match = re.match(r'\s*<(/?\w+)', line)
-                tag = tag_match.group(1) if tag_match else None
-                structure.append((leading_ws, tag))
-        return structure
+            return LineSignatures.build(f.readlines())
+
+    def structure(signatures, i):
+        tag = token_text(signatures.tag[i])
+        return (signatures.indent[i], tag[1:] if tag else None)
 
     structure1 = analyze(path1)
     structure2 = analyze(path2)
 
-    discrepancies = []
-    for i, (s1, s2) in enumerate(zip(structure1, structure2), start=1):
-        if s1 != s2:
-            discrepancies.append((i, s1, s2))
-    return discrepancies
+    return [(i + 1, structure(structure1, i), structure(structure2, i)) for i in find_structure_mismatches(structure1, structure2)]
 
 
 
 def extract_single_unit_xliff(full_xliff_path, target_unit_id, output_path, encoding="utf-8-sig"):
     """
     Utility: Extract a single <file> and <unit> from a full XLIFF file ===
+
+    target_unit_id is an exact id, even if it contains *, ? or [ or starts with "re:". See extract_units_xliff(), which
+    extracts any number of units, selected by patterns, in one go.
     """
-    with open(full_xliff_path, "r", encoding=encoding) as f:
-        lines = f.readlines()
-
-    inside_file = False
-    capture_unit = False
-    file_buffer = []
-    unit_buffer = []
-    found_unit = False
-
-    for line in lines:
-        if "<file " in line and not inside_file:
-            current_file = [line]
-            inside_file = True
-            continue
-        elif inside_file and "</file>" in line:
-            current_file.append(line)
-            if found_unit:
-                file_buffer = current_file[:1] + unit_buffer + current_file[-1:]
-                break
-            inside_file = False
-            unit_buffer = []
-            found_unit = False
-        elif inside_file:
-            current_file.append(line)
-            if "<unit " in line and f'id="{target_unit_id}"' in line:
-                capture_unit = True
-                found_unit = True
-            if capture_unit:
-                unit_buffer.append(line)
-            if "</unit>" in line and capture_unit:
-                capture_unit = False
-
-    output = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<xliff xmlns="urn:oasis:names:tc:xliff:document:2.0" version="2.0" srcLang="en" trgLang="en">\n'
-        + ''.join(file_buffer) +
-        '</xliff>\n'
-    )
-
-    with open(output_path, "wb") as f:
-        f.write(b'\xef\xbb\xbf')
-        f.write(output.encode("utf-8"))
+    extractor = UnitExtractor.for_file(full_xliff_path, encoding)
+    unit = extractor.index.find_unit(target_unit_id)
+    extractor.write(output_path, [unit] if unit is not None and extractor.index.unit_end[unit] != NO_LINE else [])
+
+
+# === Bulk Unit Extraction ===
+
+GLOB_CHARACTERS = frozenset("*?[")
+MAX_CACHED_EXTRACTORS = 8
+REGEX_PREFIX = "re:"
+UNSAFE_FILENAME_PATTERN = re.compile(r"[^\w.-]+")
+
+
+class UnitExtractor:
+    """
+    A full XLIFF file scanned once (see UnitIndex) so any number of its units can be cut out into mini XLIFF files.
+
+    A mini file is the full file's own lines: everything before the first <file> (XML declaration and <xliff> line), the
+    <file> and </file> lines around the selected units of each file, the units' lines from <unit> to </unit>, and
+    everything after the last </file>. Line endings and the BOM are kept as they are in the full file, so the units in a
+    mini file are byte for byte the same as in the full file.
+
+    Selecting and extracting units only looks up the index, so the cost is proportional to the units selected, not to
+    the file; for_file() keeps the extractors of the last MAX_CACHED_EXTRACTORS files used (until a file changes) so
+    repeated extractions from the same master don't scan it again. For random access to units without holding a file's
+    lines in memory, see MappedXliff in xliff_offset_index.
+    """
+
+    _cache = OrderedDict()  # absolute path -> (mtime_ns, size, UnitExtractor), least recently used first
+
+    def __init__(self, lines, bom=True):
+        self.lines = lines
+        self.bom = bom
+        self.index = UnitIndex.build(lines)
+        first_file = self.index.file_start[0] if self.index.file_start else len(lines)
+        last_file_end = max(self.index.file_end, default=NO_LINE)
+        self.header = lines[:first_file]
+        self.trailer = lines[last_file_end + 1:] if last_file_end != NO_LINE else []
+
+    @classmethod
+    def load(cls, path, encoding="utf-8-sig"):
+        with open(path, "rb") as f:
+            data = f.read()
+        bom = data.startswith(b'\xef\xbb\xbf')
+        # newline="" keeps the line endings exactly as they are in the file
+        return cls(io.StringIO(data.decode(encoding), newline="").readlines(), bom)
+
+    @classmethod
+    def for_file(cls, path, encoding="utf-8-sig"):
+        """
+        Returns the extractor of the file at path, reusing the one built earlier unless the file's mtime or size changed.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        cached = cls._cache.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            cls._cache.move_to_end(key)
+            return cached[2]
+        extractor = cls.load(key, encoding)
+        cls._cache[key] = (stat.st_mtime_ns, stat.st_size, extractor)
+        cls._cache.move_to_end(key)
+        while len(cls._cache) > MAX_CACHED_EXTRACTORS:
+            cls._cache.popitem(last=False)
+        return extractor
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    def select(self, patterns):
+        """
+        Returns the indices of the units matching any of patterns, in file order. A pattern is a unit id, a glob pattern
+        (e.g. calendar.*) or a regular expression prefixed with "re:" (e.g. re:calendar\.(jan|feb)\..*) matched against
+        the whole id. Unclosed units are left out.
+        """
+        selected = set()
+        matchers = []
+        for pattern in patterns:
+            if pattern.startswith(REGEX_PREFIX):
+                matchers.append(re.compile(pattern[len(REGEX_PREFIX):]).fullmatch)
+            elif GLOB_CHARACTERS.intersection(pattern):
+                matchers.append(re.compile(fnmatch.translate(pattern)).match)
+            else:
+                unit = self.index.find_unit(pattern)
+                if unit is not None:
+                    selected.add(unit)
+        if matchers:
+            for unit, unit_id in enumerate(self.index.unit_ids):
+                if unit_id is not None and any(match(unit_id) for match in matchers):
+                    selected.add(unit)
+        return [unit for unit in sorted(selected) if self.index.unit_end[unit] != NO_LINE]
+
+    def extract(self, units):
+        """
+        Returns the lines of a mini XLIFF file holding units (indices, in file order), each inside its own <file> wrapper.
+        """
+        index = self.index
+        lines = list(self.header)
+        file = None
+        for unit in units:
+            if index.unit_file[unit] != file:
+                if file is not None and file != NO_LINE and index.file_end[file] != NO_LINE:
+                    lines.append(self.lines[index.file_end[file]])
+                file = index.unit_file[unit]
+                if file != NO_LINE:
+                    lines.append(self.lines[index.file_start[file]])
+            lines.extend(index.unit_lines(self.lines, unit))
+        if file is not None and file != NO_LINE and index.file_end[file] != NO_LINE:
+            lines.append(self.lines[index.file_end[file]])
+        lines.extend(self.trailer)
+        return lines
+
+    def write(self, path, units):
+        with open(path, "wb") as f:
+            if self.bom:
+                f.write(b'\xef\xbb\xbf')
+            f.write("".join(self.extract(units)).encode("utf-8"))
+
+
+def unit_file_path(full_xliff_path, unit_id, out_dir=None):
+    """
+    The path of the mini XLIFF file of one unit: klms8-messages(en).xlf and calendar.jan.abbreviated give
+    klms8-messages.calendar.jan.abbreviated(en).xlf, in out_dir (default: next to the full file).
+    """
+    name = os.path.basename(full_xliff_path)
+    safe_id = UNSAFE_FILENAME_PATTERN.sub("_", unit_id)
+    match = MASTER_FILE_PATTERN.search(name)
+    if match:
+        name = f"{name[:match.start()]}.{safe_id}{match.group(0)}"
+    else:
+        stem, ext = os.path.splitext(name)
+        name = f"{stem}.{safe_id}{ext or '.xlf'}"
+    return os.path.join(out_dir or os.path.dirname(full_xliff_path), name)
+
+
+def extract_units_xliff(full_xliff_path, patterns, output_path, encoding="utf-8-sig"):
+    """
+    Extracts the units matching patterns (unit ids, glob patterns or "re:" regular expressions, see UnitExtractor.select())
+    from a full XLIFF file into one mini XLIFF file. Returns the ids of the units extracted.
+    """
+    extractor = UnitExtractor.for_file(full_xliff_path, encoding)
+    units = extractor.select(patterns)
+    extractor.write(output_path, units)
+    return [extractor.index.unit_ids[unit] for unit in units]
+
+
+def split_units_xliff(full_xliff_path, patterns, out_dir=None, encoding="utf-8-sig"):
+    """
+    Extracts each unit matching patterns into a mini XLIFF file of its own (see unit_file_path()), scanning the full
+    file once. Returns {unit_id: path of the file written}.
+    """
+    extractor = UnitExtractor.for_file(full_xliff_path, encoding)
+    paths = {}
+    for unit in extractor.select(patterns):
+        unit_id = extractor.index.unit_ids[unit]
+        if unit_id in paths:
+            continue  # Only the first unit with an id (see UnitIndex.find_unit())
+        paths[unit_id] = unit_file_path(full_xliff_path, unit_id, out_dir)
+        extractor.write(paths[unit_id], [unit])
+    return paths
 
 
 def insert_translated_target_block(source_lines, translated_lines, source_tag):
@@ -337,25 +462,36 @@ def insert_target_by_renaming_source_block(en_lines, translated_block):
     
     This is the preferred method going forward if translation engine preserves formatting inside tags.
     """
-    inside_target = False
-    zh_lines = []
-    inserted = False
+    return replace_target_blocks(en_lines, translated_block, "zh")
+
+
+def replace_target_blocks(en_lines, translated_block, lang_code):
+    """
+    Returns en_lines for the lang_code file: trgLang set to lang_code, final segments marked translated, every existing
+    <target> block (all of its lines) removed, and translated_block inserted after the first </source>.
+
+    The <source>/<target> line ranges come from a single UnitIndex scan of en_lines.
+    """
+    index = UnitIndex.build(en_lines)
+    removed = bytearray(len(en_lines))
+    for segment in range(index.segment_count):
+        start, end = index.target_start[segment], index.target_end[segment]
+        if start != NO_LINE:
+            end = end if end != NO_LINE else start
+            removed[start:end + 1] = b"\x01" * (end - start + 1)
+    insert_after = next((end for end in index.source_end if end != NO_LINE), NO_LINE)
 
-    for line in en_lines:
+    zh_lines = []
+    for i, line in enumerate(en_lines):
+        if removed[i]:
+            continue
         if "<xliff" in line:
-            line = line.replace('trgLang="en"', 'trgLang="zh"')
+            line = line.replace('trgLang="en"', f'trgLang="{lang_code}"')
         if "<segment" in line:
             line = line.replace('state="final"', 'state="translated"')
-        if "<target" in line:
-            inside_target = True
-            continue
-        if inside_target and "</target>" in line:
-            inside_target = False
-            continue
         zh_lines.append(line)
-        if "</source>" in line and not inserted:
+        if i == insert_after:
             zh_lines.extend(translated_block)
-            inserted = True
     return zh_lines
 
 
@@ -382,30 +518,174 @@ def generate_language_specific_file(en_path, zh_path, translated_target_block, l
     with open(en_path, "r", encoding="utf-8-sig") as f:
         en_lines = f.readlines()
 
-    zh_lines = []
-    inserted = False
-    inside_target = False
-
-    for line in en_lines:
-        # Replace trgLang in <xliff>
-        if "<xliff" in line:
-            line = line.replace(f'trgLang="en"', f'trgLang="{lang_code}"')
-        # Replace segment state
-        if "<segment" in line:
-            line = line.replace('state="final"', 'state="translated"')
-        # Remove existing target
-        if "<target" in line:
-            inside_target = True
-            continue
-        if inside_target and "</target>" in line:
-            inside_target = False
-            continue
-        zh_lines.append(line)
-        # Insert translated target block after </source>
-        if "</source>" in line and not inserted:
-            zh_lines.extend(translated_target_block)
-            inserted = True
+    zh_lines = replace_target_blocks(en_lines, translated_target_block, lang_code)
 
     with open(zh_path, "wb") as f:
         f.write(b'\xef\xbb\xbf')
         f.writelines([l.encode("utf-8") for l in zh_lines])
+
+
+# === Multi-Language Fan-Out ===
+
+TRG_LANG_PATTERN = re.compile(r'trgLang="[^"]*"')
+STATE_PATTERN = re.compile(r'\bstate="[^"]*"')
+MASTER_FILE_PATTERN = re.compile(r'\((?P<lang>[^()]+)\)(?P<ext>\.xlf)$', re.IGNORECASE)
+
+# Kinds of slot in an XliffTemplate
+LANGUAGE_SLOT = "language"
+STATE_SLOT = "state"
+TARGET_SLOT = "target"
+
+
+class XliffTemplate:
+    """
+    An English master scanned once into what every language file shares and what differs per language.
+
+    pieces is the file as a list of static spans (str, runs of master lines joined together) and slots (tuples) where
+    each language writes its own text:
+    - (LANGUAGE_SLOT, line): the <xliff> line, which gets the language's trgLang
+    - (STATE_SLOT, unit_id, line): a <segment> line, whose state becomes "translated" or "initial"
+    - (TARGET_SLOT, unit_id, master_target): the segment's <target> block, the master's own (master_target, "" if it
+      has none) unless the language has a translation for the unit
+
+    Rendering a language is then one pass over pieces with dictionary lookups, no scanning or parsing. Only the first
+    segment of a unit has slots keyed by its unit id (the KLMS and Storyline files have one segment per unit); any later
+    segments are rendered as untranslated.
+    """
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    @classmethod
+    def build(cls, en_lines):
+        """
+        Scans the lines of the English master once (see UnitIndex) and returns its template.
+        """
+        index = UnitIndex.build(en_lines)
+        state_lines = {}     # line -> unit id of the segment starting on it
+        target_slots = {}    # line -> (unit id, master target) of the target block that goes before it
+        removed = bytearray(len(en_lines) + 1)
+        for unit in range(index.unit_count):
+            for number, segment in enumerate(index.unit_segments(unit)):
+                unit_id = index.unit_ids[unit] if number == 0 else None
+                segment_line = index.segment_start[segment]
+                if "<segment" in en_lines[segment_line] and STATE_PATTERN.search(en_lines[segment_line]):
+                    state_lines[segment_line] = unit_id
+                target_start, target_end = index.target_start[segment], index.target_end[segment]
+                if target_start != NO_LINE:
+                    target_end = target_end if target_end != NO_LINE else target_start
+                    removed[target_start:target_end + 1] = b"\x01" * (target_end - target_start + 1)
+                    target_slots[target_start] = (unit_id, "".join(en_lines[target_start:target_end + 1]))
+                elif index.source_end[segment] != NO_LINE:
+                    target_slots[index.source_end[segment] + 1] = (unit_id, "")
+
+        pieces = []
+        static = []
+
+        def add_slot(slot):
+            if static:
+                pieces.append("".join(static))
+                static.clear()
+            pieces.append(slot)
+
+        for i, line in enumerate(en_lines):
+            if i in target_slots:
+                add_slot((TARGET_SLOT, *target_slots[i]))
+            if removed[i]:
+                continue
+            if "<xliff" in line:
+                add_slot((LANGUAGE_SLOT, line))
+            elif i in state_lines:
+                add_slot((STATE_SLOT, state_lines[i], line))
+            else:
+                static.append(line)
+        if len(en_lines) in target_slots:
+            add_slot((TARGET_SLOT, *target_slots[len(en_lines)]))
+        if static:
+            pieces.append("".join(static))
+        return cls(pieces)
+
+    @classmethod
+    def load(cls, en_path):
+        with open(en_path, "r", encoding="utf-8-sig") as f:
+            return cls.build(f.readlines())
+
+    def render(self, lang_code, translations):
+        """
+        Returns the lang_code file as a list of strings to write. translations maps a unit id to its translated <target>
+        block (a list of lines, as for generate_language_specific_file()). Translated segments get state "translated";
+        segments with no translation keep the master's <target> (a copy of the source) and get state "initial".
+        """
+        parts = []
+        for piece in self.pieces:
+            if isinstance(piece, str):
+                parts.append(piece)
+                continue
+            kind, *values = piece
+            if kind == TARGET_SLOT:
+                unit_id, master_target = values
+                block = translations.get(unit_id)
+                if block:
+                    parts.extend(block)
+                else:
+                    parts.append(master_target)
+            elif kind == STATE_SLOT:
+                unit_id, line = values
+                state = "translated" if unit_id in translations else "initial"
+                parts.append(STATE_PATTERN.sub(f'state="{state}"', line, count=1))
+            else:
+                line = values[0]
+                if TRG_LANG_PATTERN.search(line):
+                    parts.append(TRG_LANG_PATTERN.sub(f'trgLang="{lang_code}"', line, count=1))
+                else:
+                    parts.append(line.replace(">", f' trgLang="{lang_code}">', 1))
+        return parts
+
+    def write(self, path, lang_code, translations):
+        with open(path, "wb") as f:
+            f.write(b'\xef\xbb\xbf')
+            f.write("".join(self.render(lang_code, translations)).encode("utf-8"))
+
+
+def language_file_path(en_path, lang_code, out_dir=None):
+    """
+    The path of the lang_code file for a master named like klms8-messages(en).xlf, in out_dir (default: next to the master).
+    A master without a language in its name (master.xlf) gives master(lang_code).xlf. Raises ValueError if the path
+    would be the master itself.
+    """
+    name = os.path.basename(en_path)
+    if MASTER_FILE_PATTERN.search(name):
+        name = MASTER_FILE_PATTERN.sub(f"({lang_code})\\g<ext>", name)
+    else:
+        stem, ext = os.path.splitext(name)
+        name = f"{stem}({lang_code}){ext or '.xlf'}"
+    path = os.path.join(out_dir or os.path.dirname(en_path), name)
+    if os.path.abspath(path) == os.path.abspath(en_path):
+        raise ValueError(f"The {lang_code} file would overwrite the master {en_path}")
+    return path
+
+
+def generate_language_files(en_path, translations_by_language, out_dir=None, workers=None):
+    """
+    Creates one XLIFF file per language from the English master, scanning the master only once.
+
+    Unlike generate_language_specific_file(), which inserts a single block, every unit with a translation gets its
+    translated <target> block: the master is turned into an XliffTemplate and each language is rendered from it and
+    written, with the files written concurrently.
+
+    Args:
+    - en_path: Path to the validated English file (e.g., klms8-messages(en).xlf)
+    - translations_by_language: {lang_code: {unit_id: translated target block lines}}
+    - out_dir: Folder for the new files (default: the master's folder); files are named like klms8-messages(zh).xlf
+    - workers: Number of files written at the same time (default: one per language)
+
+    Returns {lang_code: path of the file written}.
+    """
+    template = XliffTemplate.load(en_path)
+    paths = {lang_code: language_file_path(en_path, lang_code, out_dir) for lang_code in translations_by_language}
+    with ThreadPoolExecutor(max_workers=workers or max(1, len(paths))) as executor:
+        futures = [executor.submit(template.write, paths[lang_code], lang_code, translations)
+                   for lang_code, translations in translations_by_language.items()]
+        for future in futures:
+            future.result()
+    return paths
@@ -0,0 +1,241 @@
+"""
+Line Index of the Units and Segments in an XLIFF File
+
+Several line-based checks and the translation helpers used to each walk the file with their own little state machine
+('<unit' in line, '<source' in line, ...). UnitIndex does that scan once, in a single O(lines) pass, and records where
+every unit and segment is, so its users just look up line ranges instead of rescanning the file.
+
+The index is stored as parallel arrays (array.array of 0-based line numbers, NO_LINE where an element is missing), which
+keeps it compact even for files with hundreds of thousands of units. End lines are inclusive: the lines of a <source>
+are lines[source_start[s]:source_end[s] + 1].
+
+Like the checks it replaces, the scan works on the lines as written (the KLMS/Storyline layout of one element per
+line, or an element opened and closed on the same line) and doesn't parse XML, so it can index files that aren't
+well-formed.
+"""
+
+import re
+from array import array
+from itertools import accumulate
+
+NO_LINE = -1
+
+ID_PATTERN = re.compile(r'id=["\'](.*?)["\']')
+STATE_PATTERN = re.compile(r'\bstate=["\'](.*?)["\']')
+
+
+class UnitIndex:
+    """
+    Where each unit and segment of an XLIFF file is, by line.
+
+    Attributes:
+        file_ids (list[str]): The id of each <file> element (None if it has none), in file order.
+        file_start, file_end (array): Lines of each <file> and </file>.
+        unit_ids (list[str]): The id of each unit (None if it has none), in file order.
+        unit_file (array): The <file> element each unit is in, as an index into file_ids (NO_LINE if none).
+        unit_start, unit_end (array): Lines of each unit's <unit> and </unit>.
+        original_data_start, original_data_end (array): Lines of each unit's <originalData> and </originalData>.
+        unit_segment_start, unit_segment_end (array): The unit's segments are segment_start[unit_segment_start[u]:
+            unit_segment_end[u]] (segments are stored in file order, so each unit's segments are contiguous).
+        segment_unit (array): The unit each segment (or <ignorable>) belongs to, NO_LINE if it is outside any unit.
+        segment_start, segment_end (array): Lines of the <segment> and </segment>.
+        segment_state (array): The segment's state as an index into states.
+        states (list[str]): The distinct segment state values seen; "" (index 0) when a segment has no state.
+        source_start, source_end, target_start, target_end (array): Lines of the segment's <source>/<target> and their
+            closing tags.
+        line_offsets (array): Character offset of the start of each line in the decoded file, plus the total length.
+    """
+
+    def __init__(self):
+        self.file_ids = []
+        self.file_start = array("l")
+        self.file_end = array("l")
+        self.unit_ids = []
+        self.unit_file = array("l")
+        self.unit_start = array("l")
+        self.unit_end = array("l")
+        self.original_data_start = array("l")
+        self.original_data_end = array("l")
+        self.unit_segment_start = array("l")
+        self.unit_segment_end = array("l")
+        self.segment_unit = array("l")
+        self.segment_start = array("l")
+        self.segment_end = array("l")
+        self.segment_state = array("l")
+        self.states = [""]
+        self.source_start = array("l")
+        self.source_end = array("l")
+        self.target_start = array("l")
+        self.target_end = array("l")
+        self.line_offsets = array("q")
+        self._unit_positions = None
+
+    @classmethod
+    def build(cls, lines):
+        """
+        Scans lines once and returns their UnitIndex.
+        """
+        index = cls()
+        index.line_offsets = array("q", accumulate(map(len, lines), initial=0))
+        state_codes = {"": 0}
+        file = NO_LINE
+        unit = NO_LINE
+        segment = NO_LINE
+
+        def open_segment(i, line):
+            nonlocal segment
+            match = STATE_PATTERN.search(line)
+            state = match.group(1) if match else ""
+            if state not in state_codes:
+                state_codes[state] = len(index.states)
+                index.states.append(state)
+            segment = len(index.segment_start)
+            index.segment_unit.append(unit)
+            index.segment_start.append(i)
+            index.segment_end.append(NO_LINE)
+            index.segment_state.append(state_codes[state])
+            for column in (index.source_start, index.source_end, index.target_start, index.target_end):
+                column.append(NO_LINE)
+            if unit != NO_LINE:
+                index.unit_segment_end[unit] = segment + 1
+
+        for i, line in enumerate(lines):
+            if "<file" in line:
+                match = ID_PATTERN.search(line)
+                file = len(index.file_ids)
+                index.file_ids.append(match.group(1) if match else None)
+                index.file_start.append(i)
+                index.file_end.append(NO_LINE)
+
+            if "<unit" in line:
+                match = ID_PATTERN.search(line)
+                unit = len(index.unit_ids)
+                index.unit_ids.append(match.group(1) if match else None)
+                index.unit_file.append(file)
+                index.unit_start.append(i)
+                index.unit_end.append(NO_LINE)
+                index.original_data_start.append(NO_LINE)
+                index.original_data_end.append(NO_LINE)
+                index.unit_segment_start.append(len(index.segment_start))
+                index.unit_segment_end.append(len(index.segment_start))
+                segment = NO_LINE
+
+            if unit != NO_LINE:
+                if "<originalData" in line:
+                    index.original_data_start[unit] = i
+                if "</originalData" in line:
+                    index.original_data_end[unit] = i
+
+            if "<segment" in line or "<ignorable" in line:
+                open_segment(i, line)
+
+            # A <source> or <target> outside a <segment>, or a second one in the same segment, starts a new segment
+            if "<source" in line:
+                if segment == NO_LINE or index.source_start[segment] != NO_LINE:
+                    open_segment(i, "")
+                index.source_start[segment] = i
+            if "</source" in line or ("<source" in line and line.rstrip().endswith("/>")):
+                if segment != NO_LINE:
+                    index.source_end[segment] = i
+
+            if "<target" in line:
+                if segment == NO_LINE or index.target_start[segment] != NO_LINE:
+                    open_segment(i, "")
+                index.target_start[segment] = i
+            if "</target" in line or ("<target" in line and line.rstrip().endswith("/>")):
+                if segment != NO_LINE:
+                    index.target_end[segment] = i
+
+            if "</segment" in line or "</ignorable" in line:
+                if segment != NO_LINE:
+                    index.segment_end[segment] = i
+                segment = NO_LINE
+
+            if "</unit>" in line and unit != NO_LINE:
+                index.unit_end[unit] = i
+                unit = NO_LINE
+                segment = NO_LINE
+
+            if "</file>" in line and file != NO_LINE:
+                index.file_end[file] = i
+
+        return index
+
+    @property
+    def unit_count(self):
+        return len(self.unit_ids)
+
+    @property
+    def segment_count(self):
+        return len(self.segment_start)
+
+    def unit_segments(self, unit):
+        """
+        The indices of the unit's segments.
+        """
+        return range(self.unit_segment_start[unit], self.unit_segment_end[unit])
+
+    def unit_id_of_segment(self, segment):
+        unit = self.segment_unit[segment]
+        return self.unit_ids[unit] if unit != NO_LINE else None
+
+    def state_of_segment(self, segment):
+        return self.states[self.segment_state[segment]]
+
+    def find_unit(self, unit_id):
+        """
+        Returns the index of the first unit with id unit_id, or None.
+        """
+        if self._unit_positions is None:
+            self._unit_positions = {}
+            for unit, uid in enumerate(self.unit_ids):
+                self._unit_positions.setdefault(uid, unit)
+        return self._unit_positions.get(unit_id)
+
+    def source_lines(self, lines, segment):
+        """
+        The lines of the segment's <source> element, or [] if it has none (or it isn't closed).
+        """
+        return _span(lines, self.source_start[segment], self.source_end[segment])
+
+    def target_lines(self, lines, segment):
+        """
+        The lines of the segment's <target> element, or [] if it has none (or it isn't closed).
+        """
+        return _span(lines, self.target_start[segment], self.target_end[segment])
+
+    def unit_lines(self, lines, unit):
+        """
+        The lines of the unit, from <unit> to </unit>, or [] if the unit isn't closed.
+        """
+        return _span(lines, self.unit_start[unit], self.unit_end[unit])
+
+
+def element_content(lines, start, end, name):
+    """
+    Returns the content of the <name> element on lines start to end (0-based, inclusive) as written in the file, between
+    the end of its start tag and its end tag: "" if the element is self-closed or empty, None if it isn't there or closed.
+    """
+    if start == NO_LINE or end == NO_LINE:
+        return None
+    first = lines[start]
+    tag_start = first.find(f"<{name}")
+    tag_end = first.find(">", tag_start)
+    if tag_end == -1:
+        return None  # A start tag split over lines isn't in the KLMS/Storyline layout; treat it as not comparable
+    if first[tag_end - 1] == "/":
+        return ""
+    if start == end:
+        close = first.rfind(f"</{name}")
+        return first[tag_end + 1:close] if close > tag_end else None
+    last = lines[end]
+    close = last.rfind(f"</{name}")
+    if close == -1:
+        return None
+    return first[tag_end + 1:] + "".join(lines[start + 1:end]) + last[:close]
+
+
+def _span(lines, start, end):
+    if start == NO_LINE or end == NO_LINE:
+        return []
+    return lines[start:end + 1]
@@ -1,12 +1,105 @@
 import os
-from xliff_validator import validate_xliff_file
+import re
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from xliff_validator import validate_xliff_file, validate_xliff_file_pair
+from validation_cache import ValidationCache
+from utils import configure_logging
+
+MASTER_LANGUAGE = 'en'
+LANGUAGE_FILE_PATTERN = re.compile(r'^(?P<stem>.*)\((?P<lang>[^()]+)\)\.xlf$', re.IGNORECASE)
 
 def list_xlf_files(folder_path):
-    return [
+    return sorted(
         os.path.join(folder_path, f)
         for f in os.listdir(folder_path)
         if f.lower().endswith('.xlf')
-    ]
+    )
+
+def plan_validation_jobs(filepaths, master_language=MASTER_LANGUAGE):
+    """
+    Turns a list of XLIFF files into validation jobs of (filepath, master_filepath).
+
+    Each language file named like name(xx).xlf is paired with name(en).xlf when that master is in the list, so it gets
+    the file pair checks. Masters, and files with no master, get a single file job (master_filepath is None).
+    Jobs are returned in the same order as filepaths so batch output is deterministic.
+    """
+    masters = {}
+    for filepath in filepaths:
+        match = LANGUAGE_FILE_PATTERN.match(os.path.basename(filepath))
+        if match and match.group('lang').lower() == master_language:
+            masters[(os.path.dirname(filepath), match.group('stem'))] = filepath
+
+    jobs = []
+    for filepath in filepaths:
+        match = LANGUAGE_FILE_PATTERN.match(os.path.basename(filepath))
+        master_filepath = masters.get((os.path.dirname(filepath), match.group('stem'))) if match else None
+        if master_filepath == filepath:
+            master_filepath = None
+        jobs.append((filepath, master_filepath))
+    return jobs
+
+def run_validation_job(job, cache_dir=None, collect_all=False):
+    """
+    Runs one job from plan_validation_jobs() and returns its list of ValidationIssue objects. Top level so it can be
+    sent to worker processes. Masters are validated by their own job, so pair jobs don't validate the master again.
+    """
+    filepath, master_filepath = job
+    cache = ValidationCache(cache_dir) if cache_dir else None
+    if master_filepath:
+        return validate_xliff_file_pair(master_filepath, filepath, validate_master=False, cache=cache, collect_all=collect_all)
+    return validate_xliff_file(filepath, cache=cache, collect_all=collect_all)
+
+def _init_worker(verbosity):
+    # Log like the parent process, and compile the XLIFF schema once per worker, up front, rather than inside the first job it runs
+    from checks.check_xliff_schema import load_xliff_schema
+    if verbosity is not None:
+        configure_logging(verbosity)
+    load_xliff_schema()
+
+def iter_validation_results(filepaths, workers=None, cache_dir=None, collect_all=False, verbosity=None):
+    """
+    Validates a batch of XLIFF files, fanning the jobs out across a process pool, and yields each file's result as soon
+    as it (and every file before it) is done, so callers can stream output instead of holding the whole batch.
+
+    Args:
+        filepaths (list[str]): XLIFF files to validate. Language files are paired with their (en) master automatically.
+        workers (int): Number of worker processes. Defaults to os.cpu_count(); 1 runs everything serially in this process.
+        cache_dir (str): Optional ValidationCache directory shared by all workers; unchanged files reuse cached results.
+        collect_all (bool): Run every applicable check on each file instead of stopping at its first failing check.
+        verbosity (int): If set, worker processes call configure_logging(verbosity) (see utils); by default they
+                         inherit the parent's logging setup where the platform forks, and stay silent otherwise.
+
+    Yields:
+        tuple[str, str, list[ValidationIssue]]: (filepath, master_filepath, issues) for each file, in the order
+        the files were given regardless of which worker finished first.
+    """
+    jobs = plan_validation_jobs(filepaths)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+
+    run_job = partial(run_validation_job, cache_dir=cache_dir, collect_all=collect_all)
+    if workers <= 1:
+        for job in jobs:
+            yield job[0], job[1], run_job(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(verbosity,)) as executor:
+            for (filepath, master_filepath), issues in zip(jobs, executor.map(run_job, jobs)):
+                yield filepath, master_filepath, issues
+
+def validate_files(filepaths, workers=None, cache_dir=None, collect_all=False):
+    """
+    Validates a batch of XLIFF files and returns a list of (filepath, master_filepath, issues), one per file, in the
+    order the files were given. See iter_validation_results() for the arguments.
+    """
+    return list(iter_validation_results(filepaths, workers=workers, cache_dir=cache_dir, collect_all=collect_all))
+
+def validate_folder(folder_path, workers=None, cache_dir=None, collect_all=False):
+    """
+    Validates every .xlf file in folder_path. See validate_files().
+    """
+    return validate_files(list_xlf_files(folder_path), workers=workers, cache_dir=cache_dir, collect_all=collect_all)
 
 def generate_output_sections(issues_by_file, max_script_output_files=1):
     script_output = []
@@ -64,10 +157,73 @@ def generate_output_sections(issues_by_file, max_script_output_files=1):
     rule_summary += '- If a `<ph>` or `<pc>` tag references a `<data>` ID, then the **prefix before the `_` in the tag\'s ID and the `dataRef` ID must match** (e.g., `p_0` and `p_0_start`).\n'
     return '\n'.join(script_output + ['\n'] + test_results + ['\n'] + validation_table + ['\n'] + line_snippets + ['\n'] + [rule_summary])
 
-def run_and_save_output(test_dir, output_path):
+def run_and_save_output(test_dir, output_path, workers=None, cache_dir=None, collect_all=False):
     issues = []
-    for f in list_xlf_files(test_dir):
-        issues.extend(validate_xliff_file(f))
+    for _, _, file_issues in validate_folder(test_dir, workers=workers, cache_dir=cache_dir, collect_all=collect_all):
+        issues.extend(file_issues)
     output_md = generate_output_sections(issues)
     with open(output_path, 'w', encoding='utf-8') as out:
         out.write(output_md)
+
+def _print_file_result(filepath, master_filepath, issues):
+    from utils import ValidationIssue
+
+    label = os.path.basename(filepath) + (f" (against {os.path.basename(master_filepath)})" if master_filepath else "")
+    if issues:
+        print(f"\n{label}: {len(issues)} validation issue(s)\n")
+        print(ValidationIssue.table_header())
+        for issue in issues:
+            print(issue.format_as_table_row())
+        print(ValidationIssue.table_footer())
+    else:
+        print(f"{label}: no validation issues found")
+
+def main():
+    """
+    User Entry Point
+
+    Validates every .xlf file in a folder (or an explicit list of files) using a pool of worker processes and prints
+    the issues for each file, in file name order. Issues can also be streamed to JSONL and SARIF files as each file
+    completes.
+    """
+    from validation_output import open_issue_writers, close_issue_writers, write_issues
+
+    parser = argparse.ArgumentParser(description="Validate a batch of XLIFF files in parallel.")
+    parser.add_argument("paths", nargs='+', help="A folder of XLIFF files, or a list of XLIFF files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument("--cache", metavar="DIR", default=None, help="Reuse check results for unchanged files from this cache directory.")
+    parser.add_argument("--all", dest="collect_all", action="store_true", help="Run every applicable check on each file instead of stopping at the first failing check.")
+    parser.add_argument("--output", default=None, help="Also write a markdown report to this path.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress (-v) or every check with its timing (-vv) on stderr.")
+    parser.add_argument("--jsonl", metavar="PATH", default=None, help="Stream all issues to this file as JSON Lines.")
+    parser.add_argument("--sarif", metavar="PATH", default=None, help="Write all issues to this file as a SARIF 2.1.0 log.")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    if len(args.paths) == 1 and os.path.isdir(args.paths[0]):
+        filepaths = list_xlf_files(args.paths[0])
+    else:
+        filepaths = args.paths
+
+    writers = open_issue_writers(args.jsonl, args.sarif)
+    all_issues = [] if args.output else None
+    total = 0
+    file_count = 0
+    try:
+        for filepath, master_filepath, issues in iter_validation_results(filepaths, workers=args.workers, cache_dir=args.cache, collect_all=args.collect_all, verbosity=args.verbose):
+            file_count += 1
+            write_issues(writers, issues, [filepath, master_filepath])
+            if all_issues is not None:
+                all_issues.extend(issues)
+            _print_file_result(filepath, master_filepath, issues)
+            total += len(issues)
+    finally:
+        close_issue_writers(writers)
+    print(f"\nValidated {file_count} file(s), found {total} validation issue(s)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            out.write(generate_output_sections(all_issues))
+
+if __name__ == "__main__":
+    main()
@@ -14,15 +14,25 @@ very strict level of compliance.
 
 import os
 import sys
-import inspect
+import time
+import logging
+import tracemalloc
 import argparse
 import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from utils import Config
-from utils import read_file_lines
+from utils import logger
+from utils import configure_logging
 from utils import ValidationIssue
-from checks import ALL_SINGLE_FILE_CHECKS, ALL_FILE_PAIR_CHECKS
+from utils import ValidationReport
+from utils import CheckTiming
+from xliff_document import XliffDocument
+from validation_cache import ValidationCache
+from validation_output import open_issue_writers, close_issue_writers, write_issues
+from checks import ALL_SINGLE_FILE_CHECKS, RAW_FILE_CHECK_DISPATCH, DOCUMENT_CHECK_DISPATCH, FILE_PAIR_CHECK_DISPATCH
 
-def validate_xliff_file(filepath):
+def validate_xliff_file(filepath, cache=None, collect_all=False):
     """
     ChatGPT Entry Point for Single File Validation
 
@@ -37,62 +47,288 @@ def validate_xliff_file(filepath):
     gives up and needs user assistance in helping to resolve what is wrong because it ran of out ideas on how to fix 
     the code to resolve the issues reported by this pipeline.
 
+    By default validation stops at the first check that reports issues. Set collect_all to True to run every applicable
+    check and get all the issues in one pass (see validate_xliff_file_report() for the issues grouped by check).
+
+    Pass a ValidationCache as cache to reuse the results of checks that already ran on identical file content.
+
     Returns a list of ValidationIssue objects, or an empty list if no validation issues were found.
     """
-    print(f"Validating XLIFF file: {filepath}")
+    return validate_xliff_file_report(filepath, cache=cache, collect_all=collect_all).issues
+
+def validate_xliff_file_report(filepath, cache=None, collect_all=True, profile=False, check_workers=None, on_issues=None):
+    """
+    Same as validate_xliff_file(), but returns a ValidationReport with the issues grouped by check and the list of checks
+    that were skipped because a check they require failed. Defaults to collect-all mode.
+
+    Set profile to True to record the wall time, CPU time and peak Python memory of every check in report.timings.
+    Profiling turns on tracemalloc, which slows the run down, so leave it off for normal validation.
+
+    Set check_workers to more than 1 to run the file's independent checks at the same time in that many worker processes
+    (see _run_document_checks_parallel()). The workers are forked, so this needs the "fork" start method (Linux, macOS)
+    and runs serially where it isn't available; it is also capped at os.cpu_count() and runs serially on a single CPU,
+    where the extra processes only add overhead. It can only lower the latency of validating one very large file on a
+    multi-core machine; for many files, validate them in parallel instead (see xliff_validation_runner). The report is
+    the same as a serial run's.
+
+    on_issues is passed on to the ValidationReport, to receive each check's issues as soon as they are added.
+    """
+    logger.info("Validating XLIFF file: %s", filepath)
+
+    report = ValidationReport(profile=profile, on_issues=on_issues)
+    _validate_single_file(filepath, report, cache, collect_all, check_workers)
+    return report
+
+def _run_check(check, documents, report, cache, run_check, label=None):
+    """
+    Runs a check through the cache when there is one (and every input document could be loaded), otherwise directly.
+
+    This is the instrumentation hook for the pipeline: when the report is profiled it records a CheckTiming (wall time,
+    CPU time and tracemalloc peak) for the run, and with DEBUG logging enabled it logs how long the check took.
+    label names the input when no document is loaded yet.
+    """
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if not (report.profile or debug):
+        return _run_check_cached(check, documents, cache, run_check)
+
+    label = label or " and ".join(document.filename for document in documents if document is not None)
+    if report.profile:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    issues = _run_check_cached(check, documents, cache, run_check)
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+
+    if report.profile:
+        peak_memory = max(0, tracemalloc.get_traced_memory()[1] - memory_before)
+        report.timings.append(CheckTiming(check.__name__, label, wall_time, cpu_time, peak_memory, len(issues)))
+    if debug:
+        logger.debug("%s took %.1f ms for %s (%d issue(s))", check.__name__, wall_time * 1000, label, len(issues))
+    return issues
+
+def _run_check_cached(check, documents, cache, run_check):
+    if cache is None or None in documents:
+        return run_check()
+    return cache.run(check, documents, run_check)
+
+def _unmet_requirement(check, failed_checks):
+    """
+    Returns the name of the first check required by check (see @xliff_check requires) that failed, or None.
+    """
+    return next((name for name in check._check_requires if name in failed_checks), None)
+
+def _validate_single_file(filepath, report, cache=None, collect_all=False, check_workers=None):
+    """
+    Runs the single file checks against filepath, loading and parsing the file at most once, and adds their issues to report.
+
+    Returns a tuple of (document, failed_checks). The document is None when the file couldn't be loaded or decoded after a
+    binary-only check failed, otherwise it is the XliffDocument the checks ran against so callers (e.g. file pair validation)
+    can reuse it. failed_checks is the set of names of checks that reported issues or were skipped.
+    """
+    failed_checks = set()
+    document = None
+    if cache is not None:
+        # The cache key needs the file content, so load it up front. If it can't be read, the binary-only checks report it.
+        try:
+            document = XliffDocument.load(filepath)
+        except OSError:
+            pass
 
     # Run binary-only checks first (e.g., UTF-8 BOM)
-    for check in ALL_SINGLE_FILE_CHECKS:
-        parameter_count = len(inspect.signature(check).parameters);
-        if parameter_count == 1:
-            issues = check(filepath)
-            if issues:
-                return issues
+    for check, arguments in RAW_FILE_CHECK_DISPATCH:
+        issues = _run_check(check, [document], report, cache, lambda: check(*arguments(filepath, None)), os.path.basename(filepath))
+        report.add(check.__name__, issues)
+        if issues:
+            failed_checks.add(check.__name__)
+            if not collect_all:
+                return None, failed_checks
 
-    filename = os.path.basename(filepath)
-    lines = read_file_lines(filepath)
+    try:
+        if document is None:
+            document = XliffDocument.load(filepath)
+        filename = document.filename
+        _ = document.lines  # Decode up front so a file that isn't UTF-8 is handled here rather than inside a check
+    except (OSError, UnicodeDecodeError):
+        if not failed_checks:
+            raise
+        # A binary-only check already reported why the file can't be read as UTF-8, so the rest can't run
+        for check in ALL_SINGLE_FILE_CHECKS:
+            if check.__name__ not in report.issues_by_check:
+                report.skip(check.__name__, os.path.basename(filepath), "file could not be read as UTF-8")
+                failed_checks.add(check.__name__)
+        return None, failed_checks
 
-    for check in ALL_SINGLE_FILE_CHECKS:
-        parameter_count = len(inspect.signature(check).parameters);
-        if parameter_count != 1:
-            issues = check(filename, lines)
-            if issues:
-                return issues
+    results = None
+    if check_workers:
+        check_workers = min(check_workers, os.cpu_count() or 1)
+    if check_workers and check_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        results = _run_document_checks_parallel(document, report, cache, check_workers, failed_checks)
 
-    return []
+    for check, arguments in DOCUMENT_CHECK_DISPATCH:
+        unmet = _unmet_requirement(check, failed_checks)
+        if unmet:
+            report.skip(check.__name__, filename, f"requires {unmet}")
+            failed_checks.add(check.__name__)
+            continue
+        if results is not None:
+            issues = results[check.__name__]
+        else:
+            issues = _run_check(check, [document], report, cache, lambda: check(*arguments(filepath, document)))
+        report.add(check.__name__, issues)
+        if issues:
+            failed_checks.add(check.__name__)
+            if not collect_all:
+                break
 
-def validate_xliff_file_pair(master_filepath, translated_filepath):
+    return document, failed_checks
+
+# The document (and cache) the worker processes of _run_document_checks_parallel() run checks against. Set before the
+# pool forks, so the workers inherit the loaded bytes, decoded lines and parsed tree instead of receiving a copy.
+_worker_document = None
+_worker_cache = None
+
+def _run_document_checks_parallel(document, report, cache, check_workers, failed_checks):
+    """
+    Runs the document checks of DOCUMENT_CHECK_DISPATCH against document in a pool of check_workers forked processes and
+    returns {check name: issues}, for _validate_single_file() to add to the report in check number order. failed_checks
+    are the checks that already failed on the file (the raw file checks).
+
+    The parts of the document most checks share (decoded lines, lxml tree, UnitIndex, LineSignatures) are built first,
+    in this process, so the forked workers share them read-only instead of each building their own. A check is started
+    as soon as the checks it requires have finished without issues; checks whose requirements failed are left out (and
+    reported as skipped by the caller). Every check runs to completion, even in fail-fast mode, which only changes how
+    many of the results the caller uses. Profiling timings recorded in the workers are added to report.
+    """
+    global _worker_document, _worker_cache
+    from lxml import etree
+
+    try:
+        document.tree
+    except etree.XMLSyntaxError:
+        pass  # Reported by CHECK #5; the checks that need the tree won't run
+    document.unit_index
+    document.line_signatures
+
+    document_checks = {check.__name__ for check, _ in DOCUMENT_CHECK_DISPATCH}
+    results = {}
+    finished = set()
+    failed = set(failed_checks)
+    pending = list(range(len(DOCUMENT_CHECK_DISPATCH)))
+    running = {}
+    _worker_document, _worker_cache = document, cache
+    try:
+        with ProcessPoolExecutor(max_workers=check_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+            while pending or running:
+                for position in list(pending):
+                    check = DOCUMENT_CHECK_DISPATCH[position][0]
+                    if any(name in document_checks and name not in finished for name in check._check_requires):
+                        continue  # Wait for the checks it requires
+                    pending.remove(position)
+                    if _unmet_requirement(check, failed):
+                        finished.add(check.__name__)
+                        failed.add(check.__name__)
+                    else:
+                        running[executor.submit(_run_document_check_in_worker, position, report.profile)] = check
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    check = running.pop(future)
+                    issues, timings = future.result()
+                    results[check.__name__] = issues
+                    report.timings.extend(timings)
+                    finished.add(check.__name__)
+                    if issues:
+                        failed.add(check.__name__)
+    finally:
+        _worker_document, _worker_cache = None, None
+    return results
+
+def _run_document_check_in_worker(position, profile):
+    check, arguments = DOCUMENT_CHECK_DISPATCH[position]
+    document = _worker_document
+    report = ValidationReport(profile=profile)
+    issues = _run_check(check, [document], report, _worker_cache, lambda: check(*arguments(document.filepath, document)))
+    return issues, report.timings
+
+def validate_xliff_file_pair(master_filepath, translated_filepath, validate_master=True, cache=None, collect_all=False):
     """
     ChatGPT Entry Point for File Pair Validation (Master XLIFF and a translated language XLIFF)
 
     ChatGPT's has access to files at the project level, and their paths are like /mnt/data/klms8-messages(es).xlf 
     So ChatGPT should use this function for validating a translated file against the English master
     it is based on. See the docstring comments in validate_xliff_file() for more info.
+
+    Set validate_master to False when the master has already been validated on its own (e.g. batch runs that pair many
+    languages with the same master), so its single file checks aren't repeated for every language.
     
     Returns a list of ValidationIssue objects, or an empty list if no validation issues were found.
     """
+    return validate_xliff_file_pair_report(master_filepath, translated_filepath, validate_master, cache, collect_all).issues
+
+def validate_xliff_file_pair_report(master_filepath, translated_filepath, validate_master=True, cache=None, collect_all=True, profile=False, on_issues=None):
+    """
+    Same as validate_xliff_file_pair(), but returns a ValidationReport (see validate_xliff_file_report()). Defaults to
+    collect-all mode.
+    """
+    logger.info("Validating XLIFF file: %s against master %s", translated_filepath, master_filepath)
 
-    print(f"Validating XLIFF file: {translated_filepath} against master {master_filepath}")
+    report = ValidationReport(profile=profile, on_issues=on_issues)
+    if validate_master:
+        logger.info("Validating XLIFF file: %s", master_filepath)
+        master_document, master_failed = _validate_single_file(master_filepath, report, cache, collect_all)
+        if report.issues and not collect_all:
+            return report
+    else:
+        master_document, master_failed = XliffDocument.load(master_filepath), set()
 
-    english_filename = os.path.basename(master_filepath)
-    issues = validate_xliff_file(master_filepath)
-    if issues:
-        return issues
+    logger.info("Validating XLIFF file: %s", translated_filepath)
+    translated_document, translated_failed = _validate_single_file(translated_filepath, report, cache, collect_all)
+    if report.issues and not collect_all:
+        return report
 
-    translated_filename = os.path.basename(translated_filepath)
-    issues = validate_xliff_file(translated_filepath)
-    if issues:
-        return issues
+    documents = [master_document, translated_document]
+    failed_checks = master_failed | translated_failed
+    for check, arguments in FILE_PAIR_CHECK_DISPATCH:
+        if None in documents:
+            report.skip(check.__name__, os.path.basename(translated_filepath), "both files must be readable as UTF-8")
+            continue
+        unmet = _unmet_requirement(check, failed_checks)
+        if unmet:
+            report.skip(check.__name__, translated_document.filename, f"requires {unmet}")
+            continue
+        issues = _run_check(check, documents, report, cache, lambda: check(*arguments(master_document, translated_document)))
+        report.add(check.__name__, issues)
+        if issues and not collect_all:
+            break
 
-    master_lines = read_file_lines(master_filepath)
-    translated_lines = read_file_lines(translated_filepath)
+    return report
 
-    for check in ALL_FILE_PAIR_CHECKS:
-        issues = check(english_filename, master_lines, translated_filename, translated_lines)
+def print_issues_by_check(report):
+    """
+    Prints one issue table per check that reported issues, in the order the checks ran.
+    """
+    for check_name, issues in report.issues_by_check.items():
         if issues:
-            return issues
+            print(f"{check_name}: {len(issues)} issue(s)")
+            print(ValidationIssue.table_header())
+            for issue in issues:
+                print(issue.format_as_table_row())
+            print(ValidationIssue.table_footer())
 
-    return []
+def print_timings(report):
+    """
+    Prints the check timings recorded by a profiled run, slowest first.
+    """
+    print("\nCheck timings (slowest first):")
+    print(CheckTiming.table_header())
+    for timing in report.timings_by_wall_time():
+        print(timing.format_as_table_row())
+    print(CheckTiming.table_footer())
 
 def main():
     """
@@ -108,31 +344,65 @@ def main():
     try:
         parser = argparse.ArgumentParser(description="Validate XLIFF files.")
         parser.add_argument("files", nargs='+', help="List of XLIFF files. Pass one for single file validation, two for file pair validation.")
+        parser.add_argument("--cache", metavar="DIR", default=None, help="Reuse check results for unchanged files from this cache directory.")
+        parser.add_argument("--all", dest="collect_all", action="store_true", help="Run every applicable check and report all issues, instead of stopping at the first failing check.")
+        parser.add_argument("--stream", action="store_true", help="Validate a single (very large) file in one streaming pass with the per-unit checks only.")
+        parser.add_argument("-v", "--verbose", action="count", default=0, help="Show progress (-v) or every check with its timing (-vv) on stderr.")
+        parser.add_argument("--check-workers", type=int, default=None, metavar="N", help="Run a single file's independent checks in parallel in N forked worker processes (for very large files on a multi-core machine). Capped at the number of CPUs; serial on a single CPU or where fork isn't available (e.g. Windows).")
+        parser.add_argument("--profile", action="store_true", help="Time every check (wall, CPU, peak memory) and print the checks slowest first.")
+        parser.add_argument("--jsonl", metavar="PATH", default=None, help="Also write the issues to this file as JSON Lines.")
+        parser.add_argument("--sarif", metavar="PATH", default=None, help="Also write the issues to this file as a SARIF 2.1.0 log.")
         args = parser.parse_args()
+        configure_logging(args.verbose)
 
-        if len(args.files) == 1:
-            issues = validate_xliff_file(args.files[0])
-        elif len(args.files) == 2:
-            issues = validate_xliff_file_pair(args.files[0], args.files[1])
-        else:
-            print("Usage: python xliff_validator.py <file.xlf> OR <english.xlf> <translated.xlf>")
+        if len(args.files) > 2:
+            print("Usage: python xliff_validator.py [--all] <file.xlf> OR <english.xlf> <translated.xlf> OR --stream <file.xlf>")
             return
 
+        cache = ValidationCache(args.cache) if args.cache else None
+        # Each check's issues are written to the JSONL/SARIF files as soon as the check has run
+        writers = open_issue_writers(args.jsonl, args.sarif)
+        on_issues = (lambda check_name, check_issues: write_issues(writers, check_issues, args.files)) if writers else None
+        try:
+            if args.stream and len(args.files) == 1:
+                from xliff_stream_validator import validate_xliff_file_streaming_report
+                report = validate_xliff_file_streaming_report(args.files[0], on_issues=on_issues)
+                args.collect_all = True
+            elif len(args.files) == 1:
+                report = validate_xliff_file_report(args.files[0], cache=cache, collect_all=args.collect_all, profile=args.profile, check_workers=args.check_workers, on_issues=on_issues)
+            else:
+                report = validate_xliff_file_pair_report(args.files[0], args.files[1], cache=cache, collect_all=args.collect_all, profile=args.profile, on_issues=on_issues)
+        finally:
+            close_issue_writers(writers)
+
+        issues = report.issues
+
         if issues:
             print(f"\nFound {len(issues)} validation issue(s):\n")
-            print(ValidationIssue.table_header())
-            for issue in issues:
-                print(issue.format_as_table_row())
-            print(ValidationIssue.table_footer())
+            if args.collect_all:
+                print_issues_by_check(report)
+            else:
+                print(ValidationIssue.table_header())
+                for issue in issues:
+                    print(issue.format_as_table_row())
+                print(ValidationIssue.table_footer())
         else:
             print("No validation issues found")
 
+        for check_name, filename, reason in report.skipped_checks:
+            print(f"Skipped {check_name} for {filename}: {reason}")
+
+        if args.profile:
+            print_timings(report)
+
     except Exception:
         print("\nException during validation:")
         traceback.print_exc()
 
 if __name__ == "__main__":
-    sys.argv = ["xliff_validator.py", os.path.join(Config.TEST_FILES_PATH, "klms8-messages(en).xlf"), os.path.join(Config.TEST_FILES_PATH, "klms8-messages(es).xlf")]
-    #sys.argv = ["xliff_validator.py", os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(en).xlf"), os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(es).xlf")]
-    sys.argv = ["xliff_validator.py", os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(en).xlf")]
+    if len(sys.argv) == 1:
+        # No arguments (e.g. run from an IDE): validate one of the test files
+        #sys.argv += [os.path.join(Config.TEST_FILES_PATH, "klms8-messages(en).xlf"), os.path.join(Config.TEST_FILES_PATH, "klms8-messages(es).xlf")]
+        #sys.argv += [os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(en).xlf"), os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(es).xlf")]
+        sys.argv += [os.path.join(Config.TEST_FILES_PATH, "MCB_OTPS_L01_Storyline(en).xlf")]
     main()